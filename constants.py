@@ -1,15 +1,16 @@
+import os
 from pathlib import Path
 
-# Base directory of the project
-BASE_DIR = Path(__file__).resolve().parent
+# Base directory of the project (plain string math, no resolve() syscalls)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Config directory
-CONFIG_DIR = BASE_DIR / "config"
+# Config directory (Path: consumers use glob/"/" operators)
+CONFIG_DIR = Path(BASE_DIR) / "config"
 
 # Web directory
-STATIC_DIR = BASE_DIR / "web"
+STATIC_DIR = Path(BASE_DIR) / "web"
 
 # Configuration Files
-DEFAULT_CONFIG_PATH = str(CONFIG_DIR / "mcp_server_config.json")
-TOOL_STATES_PATH = str(CONFIG_DIR / "tool_states.json")
-SERVER_ORDER_PATH = str(CONFIG_DIR / "server_order.json")
+DEFAULT_CONFIG_PATH = os.path.join(BASE_DIR, "config", "mcp_server_config.json")
+TOOL_STATES_PATH = os.path.join(BASE_DIR, "config", "tool_states.json")
+SERVER_ORDER_PATH = os.path.join(BASE_DIR, "config", "server_order.json")
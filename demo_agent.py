@@ -1,57 +1,69 @@
 import os
+import sys
 import json
 import re
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+import jsonutil
 from pathlib import Path
 from typing import Dict, Any
 from mcp_host import MCPHost
+from llm_gate import GATE, get_client, load_env
 
-load_dotenv(override=False)
+# .env 解析进程内只做一次（见 llm_gate.load_env）
+load_env()
 
-base = os.getenv("LLM_BASE_URL")
-api_key = os.getenv("LLM_API_KEY")
 model = os.getenv("LLM_MODEL")
 
-client = OpenAI(base_url=base, api_key=api_key)
+# LLM 客户端为进程级单例，HTTP/2 连接池与 TLS 会话跨会话复用
+client = get_client()
 
 # 演示：使用 MCP Host 结合大模型进行工具调用与对话
-def main():
+async def main():
     # 初始化 Host 管理器：负责聚合 MCP 服务器工具目录、生成参数指南并路由真实调用
-    host = MCPHost(prewarm=True)
+    host = MCPHost(prewarm=False)
+    # 预热与用户输入并行，把启动开销藏进人类思考时间
+    prewarm = asyncio.create_task(host.prewarm_async())
+
+    # 读取用户输入并打印到控制台，便于观察交互内容
+    try:
+        user_msg = (await asyncio.to_thread(input, "请输入消息: ")).strip()
+    except EOFError:
+        return
+    print(f"\nUSER > {user_msg}\n")
+
+    await prewarm
     print("\nSYSTEM > 已启用的 MCP 服务器与工具\n")
     # 拉取所有启用服务器的工具，并结合状态文件过滤掉关闭的工具
     tools = host.list_all_tools()
-    if tools:
-        # 基于工具的 JSON Schema/参数列表生成可读的参数指南，帮助 LLM 正确填参
-        guide = host.tools_guide(tools)
+    # 指南只生成一次：展示与系统提示词复用同一份文本
+    guide = host.tools_guide(tools) if tools else ""
+    if guide:
         print(guide)
-
-    # 读取用户输入并打印到控制台，便于观察交互内容
-    user_msg = input("请输入消息: ").strip()
-    print(f"\nUSER > {user_msg}\n")
-    sys_prompt = (
+    # 驻留后两段对话引用同一字符串对象，字节级一致利于服务端前缀缓存
+    sys_prompt = sys.intern(
         "你是人工智能助手。可使用 MCP 工具。若需要调用工具，"
         "请仅输出如下格式文本：<tool>{\n\t\"type\": \"function\",\n\t\"name\": \"<工具名>\",\n\t\"parameters\": {…}\n}</tool>。"
-        "以下为各工具的使用说明：\n" + host.tools_guide(tools)
+        "以下为各工具的使用说明：\n" + guide
     )
 
     # 第一段对话：请求 LLM 决定是否输出 <tool> 调用契约
-    first = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": user_msg},
-        ],
-    )
+    async with GATE:
+        first = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": sys_prompt},
+                {"role": "user", "content": user_msg},
+            ],
+        )
     # 提取首次回复文本
     content = first.choices[0].message.content or ""
 
     has_tool, spec = host.detect_tool(content)
     if has_tool:
         print("\nASSISTANT > 生成的工具调用\n")
-        print(json.dumps(spec, ensure_ascii=False, indent=2))
-        tool_result = host.call_tool(spec,formated=True)
+        print(jsonutil.dumps(spec, indent=True))
+        # 工具执行放入线程池，与事件循环中的网络 I/O 并行
+        tool_result = await host.call_tool_async(spec, formated=True)
         print("\nTOOL_RESULT >\n")
         print(tool_result)
 
@@ -59,15 +71,16 @@ def main():
         # 第二段对话：
         # - 注入完整工具结果到 <tool_result> 标签
         # - 要求模型基于工具结果用中文回复用户
-        second = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": user_msg},
-                {"role": "assistant", "content": content},
-                {"role": "system", "content": "<tool_result>" + tool_result + "</tool_result> 请基于工具结果用中文回复用户。"},
-            ],
-        )
+        async with GATE:
+            second = await client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": sys_prompt},
+                    {"role": "user", "content": user_msg},
+                    {"role": "assistant", "content": content},
+                    {"role": "system", "content": "<tool_result>" + tool_result + "</tool_result> 请基于工具结果用中文回复用户。"},
+                ],
+            )
         # 打印最终助手回复
         print("\nASSISTANT > " + (second.choices[0].message.content or "") + "\n")
     else:
@@ -75,4 +88,4 @@ def main():
         print("\nASSISTANT > " + content + "\n")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+import sys
+import os
+import asyncio
+from mcp_host import MCPHost
+from demo_agent_multi import agent_loop, build_sys_prompt
+from llm_gate import load_env
+
+# .env 解析进程内只做一次（见 llm_gate.load_env）
+load_env()
+
+# 同时在跑的回合数上限；LLM 请求本身另受 llm_gate.GATE 约束
+try:
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY") or 4)
+except Exception:
+    BATCH_CONCURRENCY = 4
+
+# 演示：批量跑多条独立的用户消息（评测/离线分类类工作负载）
+async def run_batch(msgs):
+    """
+    并发执行一批互相独立的多步回合。
+    - 返回与输入同序的最终回复列表；单条失败时以错误文本占位
+    """
+    host = MCPHost(prewarm=True)
+    tools = host.list_all_tools()
+    guide = host.tools_guide(tools) if tools else ""
+    sys_prompt = build_sys_prompt(guide)
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def _one(user_msg):
+        async with sem:
+            return await agent_loop(host, sys_prompt, user_msg, verbose=False)
+
+    results = await asyncio.gather(*(_one(m) for m in msgs), return_exceptions=True)
+    out = []
+    for msg, res in zip(msgs, results):
+        if isinstance(res, BaseException):
+            res = f"[error] {res}"
+        out.append(res)
+    return out
+
+def main():
+    # 从标准输入按行读取用户消息，空行忽略
+    msgs = [line.strip() for line in sys.stdin if line.strip()]
+    if not msgs:
+        print("用法: echo '消息1' | python demo_agent_batch.py（每行一条消息）")
+        return
+    answers = asyncio.run(run_batch(msgs))
+    for msg, ans in zip(msgs, answers):
+        print(f"\nUSER > {msg}\n")
+        print(f"ASSISTANT > {ans}\n")
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,231 @@
 import os
+import sys
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+import jsonutil
 from mcp_host import MCPHost
+from llm_gate import GATE, get_client, load_env
 
-load_dotenv(override=False)
+# .env 解析进程内只做一次（见 llm_gate.load_env）
+load_env()
 
-base = os.getenv("LLM_BASE_URL")
-api_key = os.getenv("LLM_API_KEY")
 model = os.getenv("LLM_MODEL")
 
-client = OpenAI(base_url=base, api_key=api_key)
+# LLM 客户端为进程级单例，HTTP/2 连接池与 TLS 会话跨会话复用
+client = get_client()
 
-def main():
-    host = MCPHost(prewarm=True)
-    tools = host.list_all_tools()
-    guide = host.tools_guide(tools) if tools else ""
+# 单步内并发工具调用的上限，避免压垮上游 MCP 服务器
+try:
+    TOOL_CONCURRENCY = int(os.getenv("MCP_TOOL_CONCURRENCY") or 4)
+except Exception:
+    TOOL_CONCURRENCY = 4
 
-    sys_prompt = (
+# 单步工具结果注入提示词的 token 预算；超出部分裁剪，防止上下文被撑爆
+try:
+    TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET") or 4096)
+except Exception:
+    TOOL_RESULT_TOKEN_BUDGET = 4096
+
+try:
+    import tiktoken
+    try:
+        _ENC = tiktoken.encoding_for_model(model or "")
+    except Exception:
+        _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENC = None
+
+def count_tokens(text: str) -> int:
+    """估算文本 token 数；tiktoken 不可用时按 4 字符折算 1 个 token。"""
+    if _ENC is not None:
+        try:
+            return len(_ENC.encode(text))
+        except Exception:
+            pass
+    return max(1, len(text) // 4)
+
+# 相同工具输出（如 schema 查询）在多轮间反复出现，缓存其 token 数
+_TOKEN_COUNT_CACHE = {}
+
+def count_tokens_batch(texts):
+    """
+    批量估算 token 数，返回与输入同序的数量列表。
+    - tiktoken 的 `encode_batch` 在 Rust 线程池中并行处理并释放 GIL
+    - 结果按文本缓存，重复输出不再重新分词
+    """
+    if len(_TOKEN_COUNT_CACHE) > 1024:
+        _TOKEN_COUNT_CACHE.clear()
+    missing = [t for t in texts if t not in _TOKEN_COUNT_CACHE]
+    if missing:
+        if _ENC is not None:
+            try:
+                encoded = _ENC.encode_batch(missing, num_threads=os.cpu_count() or 1)
+                for t, toks in zip(missing, encoded):
+                    _TOKEN_COUNT_CACHE[t] = len(toks)
+                missing = []
+            except Exception:
+                pass
+        for t in missing:
+            _TOKEN_COUNT_CACHE[t] = count_tokens(t)
+    return [_TOKEN_COUNT_CACHE[t] for t in texts]
+
+def truncate_result(text: str, budget: int) -> str:
+    """把单条工具结果裁剪到 token 预算内，尾部追加截断标记。"""
+    if count_tokens(text) <= budget:
+        return text
+    if _ENC is not None:
+        try:
+            toks = _ENC.encode(text)[:budget]
+            return _ENC.decode(toks) + "\n<tool_result truncated>"
+        except Exception:
+            pass
+    return text[: budget * 4] + "\n<tool_result truncated>"
+
+async def call_tools(host: MCPHost, specs):
+    # 同一步内的多个工具彼此独立，用 gather 并发执行，信号量限制并发度
+    sem = asyncio.Semaphore(TOOL_CONCURRENCY)
+
+    async def _one(spec):
+        async with sem:
+            return await host.call_tool_async(spec, formated=True)
+
+    results = await asyncio.gather(*(_one(s) for s in specs), return_exceptions=True)
+    out = []
+    for spec, res in zip(specs, results):
+        if isinstance(res, BaseException):
+            res = jsonutil.dumps({"name": spec.get("name"), "error": str(res)}, indent=True)
+        out.append(res)
+    return out
+
+async def stream_completion(messages) -> str:
+    """
+    流式读取 LLM 回复；一旦出现 `</tool>` 或 `</final>` 即提前关闭流。
+    - 工具调用型回复无需等模型解码完收尾文本，可立即发起工具执行
+    """
+    async with GATE:
+        stream = await client.chat.completions.create(model=model, messages=messages, stream=True)
+    parts = []
+    tail = ""
+    done = False
+    try:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            # 结束标记可能跨 chunk 分裂，用上一轮尾部拼接后再查找
+            window = tail + delta
+            if "</tool>" in window or "</final>" in window:
+                done = True
+                break
+            tail = window[-8:]
+    finally:
+        if done:
+            try:
+                await stream.close()
+            except Exception:
+                pass
+    return "".join(parts)
+
+# 每步追加的固定指令尾部；预先驻留，所有步骤复用同一字符串对象
+_STEP_HINT = sys.intern(" 若信息不足，请继续输出工具调用；若信息充分，请按如下格式输出（<final> 后需空行）：\n<final>\n\n中文回复内容\n</final>\n并基于工具结果用中文回复；若用户问题信息不全，请直接向用户说明需要哪些补充信息。")
+
+def build_sys_prompt(guide: str) -> str:
+    """拼装多步工具调用的系统提示词；驻留后每次请求复用同一对象。"""
+    return sys.intern(
         "你是人工智能助手。可使用 MCP 工具。若需要调用工具，"
         "请仅输出如下格式文本：\n<tool>{\n\t\"type\": \"function\",\n\t\"name\": \"<工具名>\",\n\t\"parameters\": {…}\n}</tool>\n"
         "当认为信息已充分可回答时，仅输出如下格式文本：<final>...</final>。"
         "如果用户问题信息不全，请直接向用户请求补充所需信息，不要调用工具。"
         "以下为各工具的使用说明：\n" + guide
     )
-    print(sys_prompt)
-    
-    while True:
-        user_msg = input("请输入消息 (输入 Exit 结束): ").strip()
-        if user_msg.lower() == "exit":
-            break
-        print(f"\nUSER > {user_msg}\n")
 
-        messages = [
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": user_msg},
-        ]
+async def agent_loop(host: MCPHost, sys_prompt: str, user_msg: str, verbose: bool = True) -> str:
+    """
+    执行一轮完整的多步 ReAct 回合并返回最终回复文本。
+    - `verbose=False` 时不打印过程，便于批量调用复用
+    """
+    messages = [
+        {"role": "system", "content": sys_prompt},
+        {"role": "user", "content": user_msg},
+    ]
 
-        results = []
-        step = 0
-        max_steps = 5
+    step = 0
+    max_steps = 5
 
-        first = client.chat.completions.create(model=model, messages=messages)
-        content = first.choices[0].message.content or ""
+    content = await stream_completion(messages)
 
-        while step < max_steps:
-            has_tool, spec = host.detect_tool(content)
-            
-            if has_tool:
-                print("\nASSISTANT > 生成的工具调用\n")
-                print(json.dumps(spec, ensure_ascii=False, indent=2))
-            else:
+    while step < max_steps:
+        specs = host.detect_tools(content)
+
+        if not specs:
+            if verbose:
                 print("\nASSISTANT > " + content + "\n")
-                break
+            return content
+
+        # 先把工具调度出去，展示与消息组装在工具运行期间完成
+        tool_future = asyncio.create_task(call_tools(host, specs))
+        if verbose:
+            print("\nASSISTANT > 生成的工具调用\n")
+            for spec in specs:
+                print(jsonutil.dumps(spec, indent=True))
+
+        # 只追加新轮次，不再整表重建；已发送的前缀保持逐字节稳定，
+        # 服务端 prompt cache 可以按前缀命中
+        messages.append({"role": "assistant", "content": content})
+
+        step_results = await tool_future
+        blocks = []
+        # 整步共享一个 token 预算；先到的结果先占额度，超出部分被裁剪
+        remaining = TOOL_RESULT_TOKEN_BUDGET
+        for tool_result, n_tokens in zip(step_results, count_tokens_batch(step_results)):
+            budget = max(remaining, 64)
+            if n_tokens > budget:
+                clipped = truncate_result(tool_result, budget)
+                n_tokens = budget
+            else:
+                clipped = tool_result
+            remaining = max(0, remaining - n_tokens)
+            blocks.append("<tool_result>" + clipped + "</tool_result>")
+            if verbose:
+                print("\nTOOL_RESULT >\n")
+                print(clipped)
+
+        messages.append({"role": "system", "content": "".join(blocks) + _STEP_HINT})
+        content = await stream_completion(messages)
+        step += 1
 
-            tool_result = host.call_tool(spec, formated=True)
-            results.append("<tool_result>" + tool_result + "</tool_result>")
-            print("\nTOOL_RESULT >\n")
-            print(tool_result)
+    if verbose:
+        print("\nASSISTANT > " + content + "\n")
+    return content
+
+async def _read_input(prompt: str) -> str:
+    """在线程中读取输入，避免阻塞事件循环；EOF 视为退出。"""
+    try:
+        return (await asyncio.to_thread(input, prompt)).strip()
+    except EOFError:
+        return "exit"
+
+async def main():
+    host = MCPHost(prewarm=False)
+    # 预热与首次用户输入并行，把启动开销藏进人类思考时间
+    prewarm = asyncio.create_task(host.prewarm_async())
+
+    sys_prompt = None
+    while True:
+        user_msg = await _read_input("请输入消息 (输入 Exit 结束): ")
+        if user_msg.lower() == "exit":
+            break
+        print(f"\nUSER > {user_msg}\n")
 
-            messages = [
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": user_msg},
-                {"role": "assistant", "content": content},
-                {"role": "system", "content": "".join(results) +  " 若信息不足，请继续输出工具调用；若信息充分，请按如下格式输出（<final> 后需空行）：\n<final>\n\n中文回复内容\n</final>\n并基于工具结果用中文回复；若用户问题信息不全，请直接向用户说明需要哪些补充信息。"},
-            ]
-            second = client.chat.completions.create(model=model, messages=messages)
-            content = second.choices[0].message.content or ""
-            step += 1
+        if sys_prompt is None:
+            await prewarm
+            tools = host.list_all_tools()
+            guide = host.tools_guide(tools) if tools else ""
+            sys_prompt = build_sys_prompt(guide)
+            print(sys_prompt)
 
-        if step >= max_steps:
-            print("\nASSISTANT > " + content + "\n")
+        await agent_loop(host, sys_prompt, user_msg)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
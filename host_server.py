@@ -1,27 +1,131 @@
-import json
 import logging
 import os
+import time
 import threading
 import re
+import gzip
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, namedtuple
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs, unquote
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import argparse
 
 from mcp_client import MCPClientError
 from mcp_host import MCPHost
 import constants
+import jsonutil
+
+# 日志格式常量：进程内唯一的 Formatter 配置，避免各处重复字面量
+LOG_FORMAT = "[%(asctime)s] %(levelname)s %(name)s: %(message)s"
 
 CONFIG_PATH = constants.DEFAULT_CONFIG_PATH
 STATIC_DIR = constants.STATIC_DIR
 HOST: MCPHost = None
 
+# 静态文件缓存: path -> (mtime_ns, size, raw, gzipped, etag)
+# UI 的 index.html 与 /static/*.js/css 反复命中，按 mtime+size 失效后可零 I/O 响应；
+# LRU 上限防止一次性扫描大量文件时缓存无界增长
+_STATIC_CACHE = OrderedDict()
+_STATIC_CACHE_LOCK = threading.Lock()
+_STATIC_CACHE_MAX_ENTRIES = 64
+
+# tool-schema 查询的 工具名→schema 索引: server -> (时间戳, {name: tool})
+# UI 打开参数面板时会对同一服务器连续查多个工具，短 TTL 下复用一次 list_tools
+_SCHEMA_INDEX = {}
+_SCHEMA_INDEX_LOCK = threading.Lock()
+_SCHEMA_INDEX_TTL = 30.0
+
+# 无查询串的请求（绝大多数）跳过完整 urlparse，只包一层轻量结构
+_PlainURL = namedtuple("_PlainURL", ("path", "query"))
+
+# 服务器作用域路由的统一模式；精确路由（/api/server/toggle 等）优先命中，
+# 不会落到这里
+_SERVER_ROUTE = re.compile(r"^/api/server/(?P<name>[^/]+)(?:/(?P<action>[^/]+))?(?:/(?P<sub>[^/]+))?$")
+
+# 启动时扫描一次静态目录构建允许列表: 相对路径 -> Path。
+# 请求命中走字典查找，既省去每次的 stat()，也天然挡住 ../ 遍历
+def _build_static_index() -> dict:
+    idx = {}
+    try:
+        for p in STATIC_DIR.rglob("*"):
+            if p.is_file():
+                idx[p.relative_to(STATIC_DIR).as_posix()] = p
+    except OSError:
+        pass
+    return idx
+
+
+_STATIC_FILES = _build_static_index()
+_STATIC_FILES_LOCK = threading.Lock()
+
+
+def _lookup_static(rel: str):
+    """按相对路径查找静态文件；索引未命中时做一次带遍历防护的慢路径校验。"""
+    f = _STATIC_FILES.get(rel)
+    if f is not None:
+        return f
+    if not rel or rel.startswith("/") or ".." in rel.split("/"):
+        return None
+    cand = STATIC_DIR / rel
+    try:
+        resolved = cand.resolve()
+        if not resolved.is_file():
+            return None
+        # 确认仍位于静态目录内（防符号链接/编码绕过）
+        resolved.relative_to(STATIC_DIR.resolve())
+    except (OSError, ValueError):
+        return None
+    # 启动后新增的文件补进索引，后续请求走快路径
+    with _STATIC_FILES_LOCK:
+        _STATIC_FILES[rel] = cand
+    return cand
+
+
+# 静态资源的不变量：首页路径与后缀 → MIME 映射，避免每个请求重建
+_INDEX_PATH = STATIC_DIR / "index.html"
+_MIME = {
+    ".js": "application/javascript",
+    ".css": "text/css",
+    ".html": "text/html",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+    ".woff2": "font/woff2",
+    ".json": "application/json",
+}
+# 超过该大小的文件不进内存缓存，改为流式发送（POSIX 上走 sendfile 零拷贝）
+_STATIC_CACHE_MAX_BYTES = 256 * 1024
+
+# /api/servers 响应的预序列化缓存；底层数据仅在少数几个 POST/DELETE 路由中变化，
+# UI 轮询命中时直接写出缓存字节，无需重建列表与重新序列化
+_SERVERS_VIEW = None
+_SERVERS_VIEW_LOCK = threading.Lock()
+
+
+def _invalidate_servers_view() -> None:
+    global _SERVERS_VIEW
+    with _SERVERS_VIEW_LOCK:
+        _SERVERS_VIEW = None
+
 class HostHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 + 正确的 Content-Length（各 handler 均已发送）即可让浏览器
+    # 复用连接，省去每个请求的 TCP 建连；并发由多线程 server 提供
+    protocol_version = "HTTP/1.1"
+
     def _json(self, code: int, payload: dict) -> None:
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send_json_bytes(code, jsonutil.dumps_bytes(payload))
+
+    # JSON 响应中逐请求不变的两个头，预编码为一段字节直接入缓冲
+    _JSON_STATIC_HEADERS = (
+        b"Content-Type: application/json; charset=utf-8\r\n"
+        b"Access-Control-Allow-Origin: *\r\n"
+    )
+
+    def _send_json_bytes(self, code: int, data: bytes) -> None:
         self.send_response(code)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Access-Control-Allow-Origin", "*")
+        self._headers_buffer.append(self._JSON_STATIC_HEADERS)
         self.send_header("Content-Length", str(len(data)))
         self.end_headers()
         self.wfile.write(data)
@@ -39,91 +143,176 @@ class HostHandler(BaseHTTPRequestHandler):
     # --- GET Handlers ---
 
     def handle_index(self, parsed, payload, match):
-        index = STATIC_DIR / "index.html"
-        if not index.exists():
+        if not _INDEX_PATH.exists():
             self._json(200, {"message": "Host is running", "hint": "Add web/index.html for UI"})
             return
-        data = index.read_bytes()
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+        self._send_static(_INDEX_PATH, "text/html")
 
     def handle_html(self, parsed, payload, match):
-        f = STATIC_DIR / parsed.path.lstrip("/")
-        if not f.exists():
-            if parsed.path.startswith("/static/"):
-                # Fallback to static handler logic if path also matches /static/
-                f2 = STATIC_DIR / parsed.path[len("/static/"):]
-                if f2.exists():
-                     self._serve_static_file(f2)
-                     return
+        rel = parsed.path.lstrip("/")
+        f = _lookup_static(rel)
+        if f is None and rel.startswith("static/"):
+            # Fallback to static handler logic if path also matches /static/
+            f = _lookup_static(rel[len("static/"):])
+            if f is not None:
+                self._serve_static_file(f)
+                return
+        if f is None:
             self.send_error(404)
             return
-        
-        data = f.read_bytes()
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+        self._send_static(f, "text/html")
 
     def handle_static(self, parsed, payload, match):
         # match.group(1) is the part after /static/
-        f = STATIC_DIR / match.group(1)
-        if not f.exists():
+        f = _lookup_static(match.group(1))
+        if f is None:
             self.send_error(404)
             return
         self._serve_static_file(f)
 
     def _serve_static_file(self, f):
-        mime = "text/plain"
-        if f.suffix == ".js":
-            mime = "application/javascript"
-        elif f.suffix == ".css":
-            mime = "text/css"
-        data = f.read_bytes()
+        self._send_static(f, _MIME.get(f.suffix, "application/octet-stream"))
+
+    def _send_static(self, f, mime: str) -> None:
+        """
+        带缓存地发送静态文件。
+        - 按 mtime_ns+size 缓存 (原始字节, gzip 字节, ETag)，热路径零磁盘 I/O
+        - 客户端 If-None-Match 命中时返回 304，不发送正文
+        - Accept-Encoding 含 gzip 且压缩后更小时发送 gzip 正文
+        """
+        try:
+            st = os.stat(f)
+        except OSError:
+            self.send_error(404)
+            return
+        if st.st_size > _STATIC_CACHE_MAX_BYTES:
+            self._stream_file(f, st.st_size, mime)
+            return
+        key = str(f)
+        with _STATIC_CACHE_LOCK:
+            ent = _STATIC_CACHE.get(key)
+            if ent is not None:
+                _STATIC_CACHE.move_to_end(key)
+        if ent is None or ent[0] != st.st_mtime_ns or ent[1] != st.st_size:
+            try:
+                raw = f.read_bytes()
+            except OSError:
+                self.send_error(404)
+                return
+            gz = gzip.compress(raw, 6)
+            etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+            ent = (st.st_mtime_ns, st.st_size, raw, gz, etag)
+            with _STATIC_CACHE_LOCK:
+                _STATIC_CACHE[key] = ent
+                _STATIC_CACHE.move_to_end(key)
+                while len(_STATIC_CACHE) > _STATIC_CACHE_MAX_ENTRIES:
+                    _STATIC_CACHE.popitem(last=False)
+        _, _, raw, gz, etag = ent
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = raw
+        accept = self.headers.get("Accept-Encoding") or ""
+        use_gzip = "gzip" in accept and len(gz) < len(raw)
+        if use_gzip:
+            data = gz
         self.send_response(200)
         self.send_header("Content-Type", f"{mime}; charset=utf-8")
+        self.send_header("ETag", etag)
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
         self.send_header("Content-Length", str(len(data)))
         self.end_headers()
         self.wfile.write(data)
 
+    def _stream_file(self, f, size: int, mime: str) -> None:
+        """
+        流式发送大文件，不在 Python 堆上物化完整内容。
+        - POSIX 上优先 `os.sendfile` 内核零拷贝，失败回退 `shutil.copyfileobj`
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", f"{mime}; charset=utf-8")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        with open(f, "rb") as src:
+            self.wfile.flush()
+            try:
+                fd = src.fileno()
+                # 提示内核顺序读，提升大文件预读命中率
+                if hasattr(os, "posix_fadvise"):
+                    try:
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    except OSError:
+                        pass
+                offset = 0
+                out_fd = self.wfile.fileno()
+                while offset < size:
+                    sent = os.sendfile(out_fd, fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset >= size:
+                    return
+                src.seek(offset)
+            except (AttributeError, OSError):
+                pass
+            shutil.copyfileobj(src, self.wfile, length=65536)
+
     def handle_list_servers(self, parsed, payload, match):
+        global _SERVERS_VIEW
+        with _SERVERS_VIEW_LOCK:
+            cached = _SERVERS_VIEW
+        if cached is not None:
+            self._send_json_bytes(200, cached)
+            return
+        data = jsonutil.dumps_bytes(self._compute_servers_view())
+        with _SERVERS_VIEW_LOCK:
+            _SERVERS_VIEW = data
+        self._send_json_bytes(200, data)
+
+    @staticmethod
+    def _project_server(name, entry, states) -> dict:
+        """把单个配置条目投影为列表项，合并状态文件中的启用覆盖。"""
+        if entry.get("disabled") is not None:
+            enabled = not bool(entry.get("disabled"))
+        else:
+            enabled = entry.get("enabled")
+            if enabled is None:
+                enabled = True
+        sstate = states.get(name) or {}
+        if sstate.get("enabled") is not None:
+            enabled = bool(sstate.get("enabled"))
+        return {
+            "name": name,
+            "type": entry.get("type"),
+            "url": entry.get("url"),
+            "enabled": enabled,
+            "note": entry.get("note"),
+            "description": entry.get("description") or entry.get("note") or "",
+        }
+
+    @staticmethod
+    def _compute_servers_view() -> dict:
         cfg = HOST.get_server_config()
         states = HOST.load_states()
         order = HOST.get_server_order()
-        
-        servers_map = {}
-        m = cfg.get("mcpServers") or {}
-        for k, v in m.items():
-            servers_map[k] = v
 
-        out = []
-        for name, entry in servers_map.items():
-            if entry.get("disabled") is not None:
-                enabled = not bool(entry.get("disabled"))
-            else:
-                enabled = entry.get("enabled")
-                if enabled is None:
-                    enabled = True
-            sstate = states.get(name) or {}
-            if sstate.get("enabled") is not None:
-                enabled = bool(sstate.get("enabled"))
-            out.append({
-                "name": name,
-                "type": entry.get("type"),
-                "url": entry.get("url"),
-                "enabled": enabled,
-                "note": entry.get("note"),
-                "description": entry.get("description") or entry.get("note") or "",
-            })
+        # 只读遍历，直接用配置中的映射，不再逐键复制一份
+        servers_map = cfg.get("mcpServers") or {}
+
+        out = [
+            HostHandler._project_server(name, entry, states)
+            for name, entry in servers_map.items()
+        ]
         # sort by order file
         pos = {n: i for i, n in enumerate(order)}
-        out.sort(key=lambda s: (pos.get(s.get("name"), 10**9), s.get("name") or ""))
+        tail = len(order)
+        out.sort(key=lambda s: (pos.get(s["name"], tail), s["name"]))
         meta = {"config_path": CONFIG_PATH, "keys": list(cfg.keys()), "mcpServers_count": (len(cfg.get("mcpServers") or {}) if isinstance(cfg.get("mcpServers"), dict) else None)}
-        self._json(200, {"servers": out, "meta": meta})
+        return {"servers": out, "meta": meta}
 
     def handle_get_server_order(self, parsed, payload, match):
         ord_list = HOST.get_server_order()
@@ -132,24 +321,21 @@ class HostHandler(BaseHTTPRequestHandler):
     def handle_get_config(self, parsed, payload, match):
         p = Path(CONFIG_PATH)
         if not p.exists():
-            self._json(200, {"path": CONFIG_PATH, "text": json.dumps({"mcpServers": {}}, ensure_ascii=False, indent=2)})
+            self._json(200, {"path": CONFIG_PATH, "text": jsonutil.dumps({"mcpServers": {}}, indent=True)})
             return
         try:
-            try:
-                text = p.read_text(encoding="utf-8-sig")
-            except Exception:
-                text = p.read_text(encoding="utf-8")
-            self._json(200, {"path": CONFIG_PATH, "text": text})
+            raw = p.read_bytes()
+            if raw[:3] == b"\xef\xbb\xbf":
+                raw = raw[3:]
+            self._json(200, {"path": CONFIG_PATH, "text": raw.decode("utf-8")})
         except Exception as e:
             self._json(500, {"error": str(e)})
 
     def handle_list_server_tools(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         
         # Check if enabled
-        cfg = HOST.get_server_config()
-        m = cfg.get("mcpServers") or {}
-        entry = m.get(name)
+        entry = HOST.get_server_entry(name)
         if entry and entry.get("enabled") is False:
             self._json(400, {"error": "Server disabled"})
             return
@@ -157,41 +343,60 @@ class HostHandler(BaseHTTPRequestHandler):
         states = HOST.load_states()
         try:
             res = HOST.list_tools(name)
-            tools = (res or {}).get("tools") or []
-            aug = []
-            sstate = states.get(name) or {}
-            tstate = (sstate.get("tools") if isinstance(sstate.get("tools"), dict) else {}) or {}
+        except MCPClientError as e:
+            self._json(500, {"error": str(e)})
+            return
+        except Exception as e:
+            self._json(500, {"error": str(e)})
+            return
+        tools = (res or {}).get("tools") or []
+        sstate = states.get(name) or {}
+        tstate = (sstate.get("tools") if isinstance(sstate.get("tools"), dict) else {}) or {}
+        # 增量输出：逐个工具序列化并直接写入 socket（chunked），
+        # 不再为附加 enabled/note 而复制整个工具字典，也不物化完整列表
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_chunk(b'{"tools":[')
+            first = True
             for t in tools:
                 n = t.get("name")
                 if not n:
                     continue
                 enabled = True
-                if n in tstate:
-                    v = tstate.get(n)
+                note_val = ""
+                v = tstate.get(n)
+                if isinstance(v, dict):
                     try:
                         enabled = bool(v.get("turn-on"))
                     except Exception:
                         enabled = True
-                tt = dict(t)
-                tt["enabled"] = bool(enabled)
-                try:
-                    note_val = ""
-                    if n in tstate and isinstance(tstate.get(n), dict):
-                        nv = tstate.get(n) or {}
-                        if isinstance(nv.get("note"), str):
-                            note_val = nv.get("note") or ""
-                    tt["note"] = note_val
-                except Exception:
-                    tt["note"] = ""
-                aug.append(tt)
-            self._json(200, {"tools": aug, "remote_enabled": (res or {}).get("remote_enabled", True)})
-        except MCPClientError as e:
-            self._json(500, {"error": str(e)})
-        except Exception as e:
-            self._json(500, {"error": str(e)})
+                    if isinstance(v.get("note"), str):
+                        note_val = v.get("note") or ""
+                body = jsonutil.dumps_bytes(t)
+                # 在原始编码的收尾 '}' 前拼接两个附加字段，免去 dict(t) 拷贝
+                extra = (b',"enabled":' if len(body) > 2 else b'"enabled":') + (
+                    b"true" if enabled else b"false"
+                ) + b',"note":' + jsonutil.dumps_bytes(note_val) + b"}"
+                self._write_chunk((b"" if first else b",") + body[:-1] + extra)
+                first = False
+            remote = (res or {}).get("remote_enabled", True)
+            self._write_chunk(b'],"remote_enabled":' + (b"true" if remote else b"false") + b"}")
+            self._write_chunk(b"")
+        except OSError:
+            pass
+
+    def _write_chunk(self, data: bytes) -> None:
+        """按 chunked 传输编码写出一帧；空帧为结束标记。"""
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii"))
+        self.wfile.write(data)
+        self.wfile.write(b"\r\n")
 
     def handle_list_server_prompts(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         try:
             res = HOST.list_prompts(name)
             self._json(200, res)
@@ -199,38 +404,65 @@ class HostHandler(BaseHTTPRequestHandler):
             self._json(500, {"error": str(e)})
 
     def handle_list_server_resources(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         try:
             res = HOST.list_resources(name)
             self._json(200, res)
         except MCPClientError as e:
             self._json(500, {"error": str(e)})
 
+    def handle_server_catalog(self, parsed, payload, match):
+        """一次请求聚合 tools/prompts/resources，三路 MCP 调用并行执行。"""
+        name = self.server_name
+        try:
+            with ThreadPoolExecutor(max_workers=3) as ex:
+                f_tools = ex.submit(HOST.list_tools, name)
+                f_prompts = ex.submit(HOST.list_prompts, name)
+                f_resources = ex.submit(HOST.list_resources, name)
+                tools = f_tools.result() or {}
+                prompts = f_prompts.result() or {}
+                resources = f_resources.result() or {}
+            self._json(200, {
+                "tools": tools.get("tools") or [],
+                "prompts": prompts.get("prompts") or [],
+                "resources": resources.get("resources") or [],
+                "remote_enabled": tools.get("remote_enabled", True),
+            })
+        except MCPClientError as e:
+            self._json(500, {"error": str(e)})
+        except Exception as e:
+            self._json(500, {"error": str(e)})
+
     def handle_get_server_config(self, parsed, payload, match):
-        name = unquote(match.group("name"))
-        cfg = HOST.get_server_config()
-        m = cfg.get("mcpServers") or {}
-        entry = m.get(name)
+        name = self.server_name
+        entry = HOST.get_server_entry(name)
         if not entry:
             self._json(404, {"error": "Server not found"})
             return
         self._json(200, {"name": name, "entry": entry, "meta": {"config_path": CONFIG_PATH}})
 
     def handle_tool_schema(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         q = parse_qs(parsed.query)
         tool_name = (q.get("name") or [None])[0]
         if not tool_name:
             self._bad_request("Missing tool name")
             return
         try:
-            res = HOST.list_tools(name) or {}
-            tools = res.get("tools") or []
-            schema = None
-            for t in tools:
-                if t.get("name") == tool_name:
-                    schema = t
-                    break
+            now = time.monotonic()
+            with _SCHEMA_INDEX_LOCK:
+                ent = _SCHEMA_INDEX.get(name)
+            if ent is None or now - ent[0] > _SCHEMA_INDEX_TTL:
+                res = HOST.list_tools(name) or {}
+                index = {
+                    t["name"]: t
+                    for t in (res.get("tools") or [])
+                    if t.get("name")
+                }
+                ent = (now, index)
+                with _SCHEMA_INDEX_LOCK:
+                    _SCHEMA_INDEX[name] = ent
+            schema = ent[1].get(tool_name)
             if not schema:
                 self._json(404, {"error": "Tool not found"})
                 return
@@ -255,26 +487,26 @@ class HostHandler(BaseHTTPRequestHandler):
             return
         try:
             res_str = HOST.call_tool(spec)
+            # call_tool 返回的已是紧凑 JSON 文本：校验后原样透传，
+            # 不再经历 解析→重建对象→重新序列化 的往返
             try:
-                res_obj = json.loads(res_str)
+                jsonutil.loads(res_str)
             except Exception:
-                res_obj = res_str
-            self._json(200, res_obj)
+                self._json(200, res_str)
+                return
+            self._send_json_bytes(200, res_str.encode("utf-8"))
         except MCPClientError as e:
             self._json(500, {"error": str(e)})
 
     def handle_call_server_tool(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         tool = payload.get("tool") or payload.get("name")
         arguments = payload.get("arguments") or {}
         if not tool or not isinstance(arguments, dict):
             self._bad_request("tool 和 arguments 必填")
             return
         
-        cfg = HOST.get_server_config()
-        m = cfg.get("mcpServers") or {}
-        entry = m.get(name)
-        
+        entry = HOST.get_server_entry(name)
         if not entry:
             self._json(404, {"error": "Server not found"})
             return
@@ -283,16 +515,18 @@ class HostHandler(BaseHTTPRequestHandler):
             return
         try:
             res_str = HOST.call_server_tool(name, tool, **arguments)
+            # 结果已是 JSON 文本，直接拼进外层包装，免去解析与重编码
             try:
-                res_obj = json.loads(res_str)
+                jsonutil.loads(res_str)
             except Exception:
-                res_obj = res_str
-            self._json(200, {"result": res_obj})
+                self._json(200, {"result": res_str})
+                return
+            self._send_json_bytes(200, b'{"result":' + res_str.encode("utf-8") + b"}")
         except MCPClientError as e:
             self._json(500, {"error": str(e)})
 
     def handle_validate_server(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         # 使用 HOST.list_tools 来验证，它会自动尝试连接
         try:
             res = HOST.list_tools(name) or {}
@@ -311,12 +545,13 @@ class HostHandler(BaseHTTPRequestHandler):
             self._bad_request("text required")
             return
         try:
-            cfg = json.loads(text)
+            cfg = jsonutil.loads(text)
         except Exception:
             self._bad_request("invalid json")
             return
         try:
             HOST.save_server_config(cfg)
+            _invalidate_servers_view()
             self._json(200, {"ok": True})
         except Exception as e:
             self._json(500, {"error": str(e)})
@@ -334,32 +569,39 @@ class HostHandler(BaseHTTPRequestHandler):
         if not entry:
             self._json(404, {"error": "Server not found"})
             return
-        
-        # 更新配置
-        entry["enabled"] = bool(enabled)
-        m[name] = entry
-        cfg["mcpServers"] = m # 确保更新回去
-        HOST.save_server_config(cfg)
-        
-        # 更新状态文件
+
+        # 请求值与当前生效值一致时直接返回，不重写配置/状态文件
+        if entry.get("disabled") is not None:
+            current = not bool(entry.get("disabled"))
+        else:
+            current = entry.get("enabled")
+            if current is None:
+                current = True
+        sstate0 = HOST.load_states().get(name) or {}
+        if sstate0.get("enabled") is not None:
+            current = bool(sstate0.get("enabled"))
+        if bool(enabled) == bool(current):
+            self._json(200, {"ok": True, "noop": True})
+            return
+
+        # 先更新状态文件，再保存配置：save_server_config 触发的 reload
+        # 一次性同步客户端（建立或关闭），无需再显式 enable/disable
         states = HOST.load_states()
         sstate = states.get(name) or {}
         sstate["enabled"] = bool(enabled)
         states[name] = sstate
         HOST.save_states(states)
-        
-        # 实时生效
-        try:
-            if not enabled:
-                HOST.disable_server(name)
-            else:
-                HOST.enable_server(name)
-        except Exception:
-            pass
+
+        entry["enabled"] = bool(enabled)
+        m[name] = entry
+        cfg["mcpServers"] = m # 确保更新回去
+        HOST.save_server_config(cfg)
+
+        _invalidate_servers_view()
         self._json(200, {"ok": True})
 
     def handle_toggle_tool(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         tool = payload.get("tool")
         enabled = payload.get("enabled")
         if not tool or enabled is None:
@@ -373,6 +615,10 @@ class HostHandler(BaseHTTPRequestHandler):
         if not isinstance(tstate, dict):
             tstate = {}
         tool = str(tool)
+        cur = tstate.get(tool)
+        if isinstance(cur, dict) and cur.get("turn-on") == bool(enabled):
+            self._json(200, {"ok": True, "tool": tool, "enabled": bool(enabled), "noop": True})
+            return
         tstate[tool] = {"turn-on": bool(enabled)}
         sstate["tools"] = tstate
         states[name] = sstate
@@ -380,7 +626,7 @@ class HostHandler(BaseHTTPRequestHandler):
         self._json(200, {"ok": True, "tool": tool, "enabled": bool(enabled)})
 
     def handle_set_tool_note(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         tool = payload.get("tool")
         note = payload.get("note")
         if not tool or note is None:
@@ -395,6 +641,9 @@ class HostHandler(BaseHTTPRequestHandler):
             tstate = {}
         tool = str(tool)
         entry = tstate.get(tool) or {}
+        if entry.get("note") == str(note):
+            self._json(200, {"ok": True, "noop": True})
+            return
         entry["note"] = str(note)
         tstate[tool] = entry
         sstate["tools"] = tstate
@@ -420,6 +669,7 @@ class HostHandler(BaseHTTPRequestHandler):
                 HOST.save_server_order(order)
         except Exception:
             pass
+        _invalidate_servers_view()
         self._json(200, {"ok": True})
 
     def handle_save_server_order(self, parsed, payload, match):
@@ -437,10 +687,11 @@ class HostHandler(BaseHTTPRequestHandler):
             if n not in new_order:
                 new_order.append(str(n))
         HOST.save_server_order(new_order)
+        _invalidate_servers_view()
         self._json(200, {"ok": True, "order": new_order})
 
     def handle_update_server_config(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         cfg = HOST.get_server_config()
         servers = cfg.get("mcpServers") or {}
         entry = servers.get(name)
@@ -466,19 +717,23 @@ class HostHandler(BaseHTTPRequestHandler):
             # reflect rename in order file
             if new_name != name:
                 order = HOST.get_server_order()
-                order = [new_name if x == name else x for x in order]
-                # ensure new_name present at least once
-                if new_name not in order:
-                    order.append(new_name)
+                try:
+                    # 单点替换，不再整表扫描重建
+                    order[order.index(name)] = new_name
+                except ValueError:
+                    # ensure new_name present at least once
+                    if new_name not in order:
+                        order.append(new_name)
                 HOST.save_server_order(order)
         except Exception:
             pass
+        _invalidate_servers_view()
         self._json(200, {"ok": True, "name": new_name, "entry": entry})
 
     # --- DELETE Handlers ---
 
     def handle_delete_server(self, parsed, payload, match):
-        name = unquote(match.group("name"))
+        name = self.server_name
         cfg = HOST.get_server_config()
         servers = cfg.get("mcpServers") or {}
         if name in servers:
@@ -500,6 +755,7 @@ class HostHandler(BaseHTTPRequestHandler):
                 pass
         except Exception:
             pass
+        _invalidate_servers_view()
         self._json(200, {"ok": True})
 
     # --- Router ---
@@ -511,11 +767,6 @@ class HostHandler(BaseHTTPRequestHandler):
         ("GET", r"^/api/servers$", "handle_list_servers"),
         ("GET", r"^/api/servers/order$", "handle_get_server_order"),
         ("GET", r"^/api/config$", "handle_get_config"),
-        ("GET", r"^/api/server/(?P<name>[^/]+)/tools$", "handle_list_server_tools"),
-        ("GET", r"^/api/server/(?P<name>[^/]+)/prompts$", "handle_list_server_prompts"),
-        ("GET", r"^/api/server/(?P<name>[^/]+)/resources$", "handle_list_server_resources"),
-        ("GET", r"^/api/server/(?P<name>[^/]+)/config$", "handle_get_server_config"),
-        ("GET", r"^/api/server/(?P<name>[^/]+)/tool-schema$", "handle_tool_schema"),
         # Static files last (wildcards)
         ("GET", r".*\.html$", "handle_html"),
         ("GET", r"^/static/(.*)$", "handle_static"),
@@ -527,41 +778,95 @@ class HostHandler(BaseHTTPRequestHandler):
         ("POST", r"^/api/server/add$", "handle_add_server"),
         ("POST", r"^/api/servers/order$", "handle_save_server_order"),
         ("POST", r"^/api/config$", "handle_save_config"),
-        ("POST", r"^/api/server/(?P<name>[^/]+)/call$", "handle_call_server_tool"),
-        ("POST", r"^/api/server/(?P<name>[^/]+)/validate$", "handle_validate_server"),
-        ("POST", r"^/api/server/(?P<name>[^/]+)/tools/toggle$", "handle_toggle_tool"),
-        ("POST", r"^/api/server/(?P<name>[^/]+)/tools/note$", "handle_set_tool_note"),
-        ("POST", r"^/api/server/(?P<name>[^/]+)/config$", "handle_update_server_config"),
         ("POST", r"^/api/.*", "handle_api_404"),
-
-        # DELETE Routes
-        ("DELETE", r"^/api/server/(?P<name>[^/]+)$", "handle_delete_server"),
     ]
 
+    # /api/server/{name}[/{action}[/{sub}]] 家族共用一个预编译 regex，
+    # 一次匹配得到 name/action/sub，再查表选择 handler——替代原先
+    # 每个子路由各自一条 regex 的逐条尝试
+    SERVER_ACTIONS = {
+        ("GET", "tools", None): "handle_list_server_tools",
+        ("GET", "prompts", None): "handle_list_server_prompts",
+        ("GET", "resources", None): "handle_list_server_resources",
+        ("GET", "config", None): "handle_get_server_config",
+        ("GET", "tool-schema", None): "handle_tool_schema",
+        ("GET", "catalog", None): "handle_server_catalog",
+        ("POST", "call", None): "handle_call_server_tool",
+        ("POST", "validate", None): "handle_validate_server",
+        ("POST", "tools", "toggle"): "handle_toggle_tool",
+        ("POST", "tools", "note"): "handle_set_tool_note",
+        ("POST", "config", None): "handle_update_server_config",
+        ("DELETE", None, None): "handle_delete_server",
+    }
+
+    # 启动时把 ROUTES 编译为按方法分桶的调度表：
+    # - 纯字面量模式（如 ^/api/servers$）进入精确匹配字典，O(1) 命中
+    # - 含通配/命名组的模式预编译为 regex，按声明顺序逐个尝试
+    EXACT_ROUTES: dict = {}
+    REGEX_ROUTES: dict = {}
+
+    @classmethod
+    def _build_route_table(cls) -> None:
+        # 表中直接存放已解析的函数对象，免去每个请求一次 getattr
+        exact: dict = {}
+        table: dict = {}
+        literal_re = re.compile(r"^\^([A-Za-z0-9_/\-]|\\\.)+\$$")
+        for method, pattern, handler_name in cls.ROUTES:
+            fn = getattr(cls, handler_name)
+            if literal_re.match(pattern):
+                path = pattern[1:-1].replace("\\.", ".")
+                exact.setdefault((method, path), fn)
+            else:
+                table.setdefault(method, []).append((re.compile(pattern), fn))
+        cls.EXACT_ROUTES = exact
+        cls.REGEX_ROUTES = table
+        cls.SERVER_ACTIONS = {
+            key: getattr(cls, name) for key, name in cls.SERVER_ACTIONS.items()
+        }
+
     def _dispatch(self, method):
-        parsed = urlparse(self.path)
+        raw = self.path
+        if "?" in raw or "#" in raw or ";" in raw:
+            parsed = urlparse(raw)
+        else:
+            parsed = _PlainURL(raw, "")
         path = parsed.path
         
         payload = {}
         if method == "POST":
             length = int(self.headers.get("Content-Length") or 0)
             if length > 0:
-                body = self.rfile.read(length).decode("utf-8")
+                # 不做 str 中转：jsonutil.loads 接受 bytes
+                #（orjson 单趟完成 UTF-8 校验与解析）
+                raw = self.rfile.read(length)
                 try:
-                    payload = json.loads(body)
+                    payload = jsonutil.loads(raw)
                 except Exception:
                     payload = {}
         
-        for route_method, pattern, handler_name in self.ROUTES:
-            if route_method == method:
-                match = re.match(pattern, path)
+        handler = self.EXACT_ROUTES.get((method, path))
+        match = None
+        if handler is None:
+            match = _SERVER_ROUTE.match(path)
+            if match:
+                handler = self.SERVER_ACTIONS.get(
+                    (method, match.group("action"), match.group("sub"))
+                )
+                if handler is not None:
+                    # 百分号解码只做一次，各 handler 直接取现成的名字
+                    self.server_name = unquote(match.group("name"))
+        if handler is None:
+            for pattern, fn in self.REGEX_ROUTES.get(method, ()):
+                match = pattern.match(path)
                 if match:
-                    handler = getattr(self, handler_name)
-                    try:
-                        handler(parsed, payload, match)
-                    except Exception as e:
-                        self._json(500, {"error": str(e)})
-                    return
+                    handler = fn
+                    break
+        if handler is not None:
+            try:
+                handler(self, parsed, payload, match)
+            except Exception as e:
+                self._json(500, {"error": str(e)})
+            return
         
         self.send_error(404)
 
@@ -574,6 +879,8 @@ class HostHandler(BaseHTTPRequestHandler):
     def do_DELETE(self):
         self._dispatch("DELETE")
 
+HostHandler._build_route_table()
+
 def run(host: str = None, port: int = None):
     if host is None:
         host = os.getenv("MCP_HOST_ADDR") or "127.0.0.1"
@@ -583,20 +890,40 @@ def run(host: str = None, port: int = None):
         except Exception:
             port = 8000
     try:
-        logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
     except Exception:
         pass
-    httpd = HTTPServer((host, port), HostHandler)
+    # 多线程服务器：慢的 MCP 调用（如 list_tools）不再阻塞其它请求
+    httpd = ThreadingHTTPServer((host, port), HostHandler)
+    httpd.daemon_threads = True
+    # 提高监听队列深度，突发并发下 accept 不再丢连接
+    httpd.request_queue_size = 128
     print(f"MCP Host running at http://{host}:{port}/")
     try:
         globals()["HOST"] = MCPHost(config_path=CONFIG_PATH, prewarm=False)
         def _prewarm_with_host():
             try:
-                HOST.start(prewarm=True)
+                # 并行预热：N 台服务器同时建连，首个请求不再等串行启动
+                HOST.prewarm_threaded()
             except Exception:
                 pass
         t = threading.Thread(target=_prewarm_with_host, daemon=True)
         t.start()
+        # 后台定期回收闲置客户端（stdio 子进程）；0 表示关闭
+        try:
+            idle_timeout = float(os.getenv("MCP_CLIENT_IDLE_TIMEOUT") or 300)
+        except Exception:
+            idle_timeout = 300.0
+        if idle_timeout > 0:
+            def _evict_loop():
+                import time as _time
+                while True:
+                    _time.sleep(60)
+                    try:
+                        HOST.evict_idle_clients(max_idle=idle_timeout)
+                    except Exception:
+                        pass
+            threading.Thread(target=_evict_loop, daemon=True).start()
     except Exception:
         pass
     try:
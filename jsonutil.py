@@ -0,0 +1,61 @@
+"""
+模块: jsonutil
+作用: 提供统一的 JSON 编解码入口
+- 优先使用 orjson（Rust 扩展，序列化约快一个数量级）
+- 未安装时回退到标准库 json，输出语义保持一致（非 ASCII 不转义）
+"""
+import json as _json
+
+try:
+    import orjson as _orjson
+except Exception:
+    _orjson = None
+
+# 标准库回退路径共享的编解码器实例；
+# 逐次调用 json.dumps/loads 会在内部反复构造 scanner/encoder
+_DECODER = _json.JSONDecoder()
+_ENCODER = _json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_PRETTY_ENCODER = _json.JSONEncoder(ensure_ascii=False, indent=2)
+
+
+def loads(data):
+    """
+    解析 JSON 文本或字节。
+    - orjson 可直接接受 bytes，省去一次 UTF-8 解码往返
+    """
+    if _orjson is not None:
+        return _orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return _DECODER.decode(data)
+
+
+def dumps_bytes(obj, indent: bool = False) -> bytes:
+    """
+    序列化为 UTF-8 字节串，供 HTTP 响应体等二进制出口直接写出。
+    - orjson 本身返回 bytes，省去一次 encode
+    """
+    if _orjson is not None:
+        opt = _orjson.OPT_INDENT_2 if indent else 0
+        return _orjson.dumps(obj, option=opt)
+    return dumps(obj, indent).encode("utf-8")
+
+
+def dumps(obj, indent: bool = False, sort_keys: bool = False) -> str:
+    """
+    序列化为 JSON 文本（非 ASCII 原样输出）。
+    - `indent=True` 输出两空格缩进，用于展示；否则输出紧凑形式
+    - `sort_keys=True` 按键排序，用于生成稳定的指纹/缓存键
+    """
+    if _orjson is not None:
+        opt = _orjson.OPT_INDENT_2 if indent else 0
+        if sort_keys:
+            opt |= _orjson.OPT_SORT_KEYS
+        return _orjson.dumps(obj, option=opt).decode("utf-8")
+    if sort_keys:
+        return _json.dumps(obj, ensure_ascii=False, sort_keys=True,
+                           indent=2 if indent else None,
+                           separators=None if indent else (",", ":"))
+    if indent:
+        return _PRETTY_ENCODER.encode(obj)
+    return _ENCODER.encode(obj)
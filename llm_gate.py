@@ -0,0 +1,105 @@
+"""
+模块: llm_gate
+作用: 约束对 LLM 服务的并发量与请求速率
+- `asyncio.Semaphore` 限制同时在途的补全请求数
+- 滑动窗口限制每分钟请求数（RPM），避免触发 429 后的整轮重试开销
+环境变量: `MAX_CONCURRENT_LLM`（默认 8）、`LLM_RPM`（默认 0 表示不限速）
+"""
+import os
+import time
+import atexit
+import asyncio
+import functools
+
+import httpx
+from openai import AsyncOpenAI
+
+
+_env_loaded = False
+
+
+def load_env() -> None:
+    """
+    惰性加载 `.env`：整个进程只解析一次。
+    - 避免每个模块 import 时都重复做磁盘 I/O 与逐行解析
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(override=False)
+    except Exception:
+        pass
+    _env_loaded = True
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except Exception:
+        return default
+
+
+class Gate:
+    """
+    异步上下文管理器：进入时先占用并发名额，再按滑动窗口等待 RPM 配额。
+    用法: `async with GATE: await client.chat.completions.create(...)`
+    """
+
+    def __init__(self, max_concurrent: int = 0, rpm: int = -1):
+        self._sem = asyncio.Semaphore(max_concurrent or _env_int("MAX_CONCURRENT_LLM", 8))
+        self._rpm = rpm if rpm >= 0 else _env_int("LLM_RPM", 0)
+        self._stamps = []
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        if self._rpm > 0:
+            async with self._lock:
+                now = time.monotonic()
+                # 只保留最近一分钟内的请求时间戳
+                self._stamps = [t for t in self._stamps if now - t < 60.0]
+                if len(self._stamps) >= self._rpm:
+                    wait = 60.0 - (now - self._stamps[0])
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                self._stamps.append(time.monotonic())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._sem.release()
+        return False
+
+
+# 进程级共享闸门；所有 LLM 调用点复用同一配额
+GATE = Gate()
+
+
+def _close_http_client(http_client) -> None:
+    try:
+        asyncio.run(http_client.aclose())
+    except Exception:
+        pass
+
+
+@functools.lru_cache(maxsize=1)
+def get_client() -> AsyncOpenAI:
+    """
+    进程内单例 AsyncOpenAI 客户端。
+    - 共享 HTTP 连接池（h2 可用时启用 HTTP/2 多路复用），复用 TLS 会话
+    - 连接地址与密钥取自 `LLM_BASE_URL` / `LLM_API_KEY`
+    """
+    load_env()
+    limits = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+    try:
+        http_client = httpx.AsyncClient(http2=True, limits=limits)
+    except ImportError:
+        # 未安装 h2 扩展时退回 HTTP/1.1，仍复用长连接
+        http_client = httpx.AsyncClient(limits=limits)
+    atexit.register(_close_http_client, http_client)
+    return AsyncOpenAI(
+        base_url=os.getenv("LLM_BASE_URL"),
+        api_key=os.getenv("LLM_API_KEY"),
+        http_client=http_client,
+    )
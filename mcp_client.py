@@ -1,16 +1,21 @@
 from __future__ import annotations
 import os
-import json
 import logging
+import time
 import uuid
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Any, Dict, Optional
 from pathlib import Path
 
 import requests
 import subprocess
 import threading
-import queue
 import shutil
+
+import jsonutil
 try:
     from dotenv import load_dotenv
     load_dotenv(override=False)
@@ -19,10 +24,135 @@ except Exception:
 
 LOGGER = logging.getLogger(__name__)
 
+# 环境变量在 load_dotenv 之后一次性取快照：
+# 这些值进程生命周期内不变，没必要每次构造实例都重新查一遍 environ
+_ENV = os.environ
+_DEFAULT_BASE_URL = _ENV.get("MCP_CONNECTION_URL") or _ENV.get("MCP_SERVER_URL") or ""
+_DEFAULT_API_KEY = _ENV.get("AMAP_API_KEY") or _ENV.get("AMAP_MAPS_API_KEY")
+_DEFAULT_SERVER_NAME = _ENV.get("MCP_SERVER_NAME")
+
+# 模块级共享 Session：连接池 + TLS 会话跨请求复用，
+# 避免每次 requests.post 新建 TCP/TLS 连接
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                sess = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32)
+                sess.mount("http://", adapter)
+                sess.mount("https://", adapter)
+                _SESSION = sess
+    return _SESSION
+
 
 class MCPClientError(Exception):
     pass
 
+
+# 目录类请求的负载除 id 外完全不变；预编码前缀，每次只拼接 id
+_LIST_PAYLOAD_PREFIX = {
+    method: (
+        '{"jsonrpc":"2.0","method":"%s","params":{},"id":"' % method
+    ).encode("ascii")
+    for method in ("tools/list", "prompts/list", "resources/list", "ping")
+}
+
+
+def _list_payload(method: str, rid: str) -> bytes:
+    return _LIST_PAYLOAD_PREFIX[method] + rid.encode("ascii") + b'"}'
+
+
+# tools/call 信封里除 arguments 与 id 外全是静态字节；
+# 按工具名缓存前缀，重复调用只需编码参数字典本身
+_TOOL_CALL_PREFIX: Dict[str, bytes] = {}
+
+
+def _tool_call_payload(name: str, params: Dict[str, Any], rid: str) -> bytes:
+    if len(_TOOL_CALL_PREFIX) > 256:
+        _TOOL_CALL_PREFIX.clear()
+    prefix = _TOOL_CALL_PREFIX.get(name)
+    if prefix is None:
+        prefix = (
+            b'{"jsonrpc":"2.0","method":"tools/call","params":{"name":'
+            + jsonutil.dumps_bytes(name)
+            + b',"arguments":'
+        )
+        _TOOL_CALL_PREFIX[name] = prefix
+    return prefix + jsonutil.dumps_bytes(params) + b'},"id":"' + rid.encode("ascii") + b'"}'
+
+
+# 请求 id：进程唯一前缀 + 单调计数器。
+# 每次调用生成一个 uuid4 要走系统熵池，计数器只需一次 next()
+_ID_PREFIX = uuid.uuid4().hex[:8]
+_ID_COUNTER = itertools.count(1)
+
+
+def _next_id() -> str:
+    return f"{_ID_PREFIX}-{next(_ID_COUNTER)}"
+
+
+# 目录（tools/prompts/resources）结果的 TTL；0 表示不缓存
+try:
+    _CATALOG_TTL = float(_ENV.get("MCP_CATALOG_TTL") or 30)
+except Exception:
+    _CATALOG_TTL = 30.0
+
+
+@lru_cache(maxsize=64)
+def _which(cmd: str, path: Optional[str]) -> Optional[str]:
+    """
+    缓存的可执行文件解析：`shutil.which` 每次都会遍历 PATH 并逐项 stat，
+    反复构造 stdio 客户端时纯属浪费。以 PATH 本身做缓存键，环境变化自动失效。
+    """
+    return shutil.which(cmd, path=path)
+
+
+def _catalog_get(cache: Dict[str, tuple], key: str) -> Optional[Dict[str, Any]]:
+    ent = cache.get(key)
+    if ent is not None and time.monotonic() - ent[0] <= _CATALOG_TTL:
+        return ent[1]
+    return None
+
+
+def _catalog_put(cache: Dict[str, tuple], key: str, value: Dict[str, Any]) -> Dict[str, Any]:
+    # 只缓存拿到内容的结果；失败/空结果下次重试
+    if _CATALOG_TTL > 0 and value.get(key):
+        cache[key] = (time.monotonic(), value)
+    return value
+
+
+# 已解析配置缓存: path -> (mtime_ns, size, data)
+# 每个客户端实例化都要读配置，文件未变时直接复用解析结果
+_CONFIG_CACHE: Dict[str, tuple] = {}
+_CONFIG_CACHE_LOCK = threading.Lock()
+
+
+def _load_config(cfg_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        st = os.stat(cfg_path)
+    except OSError:
+        return None
+    key = str(cfg_path)
+    with _CONFIG_CACHE_LOCK:
+        ent = _CONFIG_CACHE.get(key)
+        if ent is not None and ent[0] == st.st_mtime_ns and ent[1] == st.st_size:
+            return ent[2]
+    try:
+        raw = Path(cfg_path).read_bytes()
+        if raw[:3] == b"\xef\xbb\xbf":
+            raw = raw[3:]
+        data = jsonutil.loads(raw)
+    except Exception:
+        return None
+    with _CONFIG_CACHE_LOCK:
+        _CONFIG_CACHE[key] = (st.st_mtime_ns, st.st_size, data)
+    return data
+
 """
 模块: mcp_client
 作用: 提供两种 MCP 客户端实现
@@ -47,7 +177,7 @@ class MCPClient:
     - `call_tool(name, **params)`: 执行工具调用
     - `ping()`: 简单健康检查示例
     """
-    MCP_BASE_URL = os.getenv("MCP_CONNECTION_URL") or os.getenv("MCP_SERVER_URL", "")
+    MCP_BASE_URL = _DEFAULT_BASE_URL
 
     def __init__(self, api_key: Optional[str] = None, timeout: float = 15.0, enable_remote: bool = True, server_name: Optional[str] = None, config_path: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
         """
@@ -56,12 +186,14 @@ class MCPClient:
         - `timeout`: 网络请求超时时间(秒)
         - `enable_remote`: 是否启用远程 MCP 调用优先
         """
-        self.api_key = api_key or os.getenv("AMAP_API_KEY") or os.getenv("AMAP_MAPS_API_KEY")
+        self.api_key = api_key or _DEFAULT_API_KEY
         self.timeout = timeout
         self.enable_remote = enable_remote
         self._headers = headers or {"Accept": "application/json, text/event-stream"}
+        # 请求体改为预序列化字节（见 _post_json），需要显式声明类型
+        self._headers.setdefault("Content-Type", "application/json")
         cfg_path = config_path or str(Path(__file__).resolve().parent / "config" / "mcp_server_config.json")
-        chosen = server_name or os.getenv("MCP_SERVER_NAME")
+        chosen = server_name or _DEFAULT_SERVER_NAME
         cfg_url, cfg_headers = self._resolve_server_config(cfg_path, chosen)
         if cfg_url:
             self.MCP_BASE_URL = cfg_url
@@ -69,6 +201,10 @@ class MCPClient:
             self._headers.update(cfg_headers)
         if not self.MCP_BASE_URL:
             raise MCPClientError("No MCP server URL configured. Set MCP_CONNECTION_URL or provide mcp_server_config.json.")
+        # SSE 请求头只在此处算一次，流式调用不再逐次整表拷贝
+        self._sse_headers = {**self._headers, "Accept": "text/event-stream"}
+        # 目录结果缓存: key -> (时间戳, 结果)
+        self._catalog_cache: Dict[str, tuple] = {}
 
     def _remote_url(self) -> str:
         return self.MCP_BASE_URL
@@ -81,14 +217,9 @@ class MCPClient:
         返回: `(url, headers)`，任一无法解析时返回 `None`。
         """
         try:
-            p = Path(cfg_path)
-            if not p.exists():
+            data = _load_config(cfg_path)
+            if data is None:
                 return None, None
-            try:
-                text = p.read_text(encoding="utf-8-sig")
-            except Exception:
-                text = p.read_text(encoding="utf-8")
-            data = json.loads(text)
             m = data.get("mcpServers") or {}
             if m:
                 name = chosen
@@ -112,16 +243,15 @@ class MCPClient:
         """
         if not self.enable_remote:
             return None
-        req_id = str(uuid.uuid4())
-        payload = {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": remote_tool, "arguments": params}, "id": req_id}
+        req_id = _next_id()
         try:
-            resp = requests.post(self._remote_url(), json=payload, timeout=self.timeout, stream=False, headers=self._headers)
+            resp = _get_session().post(self._remote_url(), data=_tool_call_payload(remote_tool, params, req_id), timeout=self.timeout, stream=False, headers=self._headers)
             if resp.status_code != 200:
                 LOGGER.debug("Remote MCP call non-200 (%s) -> fallback", resp.status_code)
                 remote_raw = None
             else:
                 try:
-                    data = resp.json()
+                    data = jsonutil.loads(resp.content)
                     remote_raw = data["result"] if isinstance(data, dict) and "result" in data else data
                 except Exception:
                     LOGGER.debug("Remote MCP response not JSON decodable -> fallback")
@@ -141,16 +271,18 @@ class MCPClient:
         拉取远程 MCP 服务器的工具目录。
         返回: `{"tools": [...], "remote_enabled": bool}`；失败时 `tools` 为空列表。
         """
-        payload = {"jsonrpc": "2.0", "method": "tools/list", "params": {}, "id": str(uuid.uuid4())}
+        cached = _catalog_get(self._catalog_cache, "tools")
+        if cached is not None:
+            return cached
         try:
-            resp = requests.post(self._remote_url(), json=payload, timeout=self.timeout, stream=False, headers=self._headers)
+            resp = _get_session().post(self._remote_url(), data=_list_payload("tools/list", _next_id()), timeout=self.timeout, stream=False, headers=self._headers)
             if resp.status_code != 200:
                 return {"tools": [], "remote_enabled": self.enable_remote}
             try:
-                data = resp.json()
+                data = jsonutil.loads(resp.content)
             except Exception:
                 return {"tools": [], "remote_enabled": self.enable_remote}
-            return {"tools": (data.get("result", {}).get("tools") if isinstance(data, dict) else []), "remote_enabled": self.enable_remote}
+            return _catalog_put(self._catalog_cache, "tools", {"tools": (data.get("result", {}).get("tools") if isinstance(data, dict) else []), "remote_enabled": self.enable_remote})
         except requests.RequestException:
             return {"tools": [], "remote_enabled": self.enable_remote}
 
@@ -159,16 +291,18 @@ class MCPClient:
         拉取远程 MCP 服务器的提示词目录。
         返回: `{"prompts": [...], "remote_enabled": bool}`；失败时 `prompts` 为空列表。
         """
-        payload = {"jsonrpc": "2.0", "method": "prompts/list", "params": {}, "id": str(uuid.uuid4())}
+        cached = _catalog_get(self._catalog_cache, "prompts")
+        if cached is not None:
+            return cached
         try:
-            resp = requests.post(self._remote_url(), json=payload, timeout=self.timeout, stream=False, headers=self._headers)
+            resp = _get_session().post(self._remote_url(), data=_list_payload("prompts/list", _next_id()), timeout=self.timeout, stream=False, headers=self._headers)
             if resp.status_code != 200:
                 return {"prompts": [], "remote_enabled": self.enable_remote}
             try:
-                data = resp.json()
+                data = jsonutil.loads(resp.content)
             except Exception:
                 return {"prompts": [], "remote_enabled": self.enable_remote}
-            return {"prompts": (data.get("result", {}).get("prompts") if isinstance(data, dict) else []), "remote_enabled": self.enable_remote}
+            return _catalog_put(self._catalog_cache, "prompts", {"prompts": (data.get("result", {}).get("prompts") if isinstance(data, dict) else []), "remote_enabled": self.enable_remote})
         except requests.RequestException:
             return {"prompts": [], "remote_enabled": self.enable_remote}
 
@@ -177,19 +311,36 @@ class MCPClient:
         拉取远程 MCP 服务器的资源目录。
         返回: `{"resources": [...], "remote_enabled": bool}`；失败时 `resources` 为空列表。
         """
-        payload = {"jsonrpc": "2.0", "method": "resources/list", "params": {}, "id": str(uuid.uuid4())}
+        cached = _catalog_get(self._catalog_cache, "resources")
+        if cached is not None:
+            return cached
         try:
-            resp = requests.post(self._remote_url(), json=payload, timeout=self.timeout, stream=False, headers=self._headers)
+            resp = _get_session().post(self._remote_url(), data=_list_payload("resources/list", _next_id()), timeout=self.timeout, stream=False, headers=self._headers)
             if resp.status_code != 200:
                 return {"resources": [], "remote_enabled": self.enable_remote}
             try:
-                data = resp.json()
+                data = jsonutil.loads(resp.content)
             except Exception:
                 return {"resources": [], "remote_enabled": self.enable_remote}
-            return {"resources": (data.get("result", {}).get("resources") if isinstance(data, dict) else []), "remote_enabled": self.enable_remote}
+            return _catalog_put(self._catalog_cache, "resources", {"resources": (data.get("result", {}).get("resources") if isinstance(data, dict) else []), "remote_enabled": self.enable_remote})
         except requests.RequestException:
             return {"resources": [], "remote_enabled": self.enable_remote}
 
+    def fetch_catalog(self) -> Dict[str, Any]:
+        """
+        并行拉取工具/提示词/资源三类目录。
+        - 三个请求彼此独立，走同一个连接池并发执行，
+          总耗时取决于最慢的一个而非三者之和
+        返回: `{"tools": {...}, "prompts": {...}, "resources": {...}}`
+        """
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            fs = {
+                "tools": ex.submit(self.list_tools),
+                "prompts": ex.submit(self.list_prompts),
+                "resources": ex.submit(self.list_resources),
+            }
+            return {k: f.result() for k, f in fs.items()}
+
     def call_tool(self, name: str, **params) -> Optional[Dict[str, Any]]:
         """
         执行指定工具调用（HTTP 模式）。
@@ -202,13 +353,24 @@ class MCPClient:
 
     def ping(self) -> bool:
         """
-        简易健康检查：调用示例工具 `maps_weather`。
-        返回: 远程调用有返回值为 `True`，否则 `False`。
+        健康检查：发送协议级 `ping` 请求。
+        - 不再借道业务工具（如天气查询），避免健康检查触发外部 API 的延迟与计费
+        - 收到合法 JSON-RPC 信封（含 error，说明服务器在线）即视为健康；
+          信封不合法时退回 `tools/list` 判活
         """
+        rid = _next_id()
         try:
-            result = self.call_tool("maps_weather", city="海口")
-            return bool(result)
-        except Exception:
+            resp = _get_session().post(self._remote_url(), data=_list_payload("ping", rid), timeout=self.timeout, stream=False, headers=self._headers)
+            if resp.status_code != 200:
+                return False
+            try:
+                data = jsonutil.loads(resp.content)
+            except Exception:
+                return False
+            if isinstance(data, dict) and ("result" in data or data.get("id") == rid):
+                return True
+            return bool(self.list_tools().get("tools"))
+        except requests.RequestException:
             return False
 
     def call_tool_stream(self, name: str, **params):
@@ -217,18 +379,33 @@ class MCPClient:
         - 将 `Accept` 头设置为 `text/event-stream` 并启用 `stream=True`
         返回: 一个生成器，逐行产出服务器事件；失败返回 `None`。
         """
-        hdrs = dict(self._headers)
-        hdrs["Accept"] = "text/event-stream"
-        payload = {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": name, "arguments": params}, "id": str(uuid.uuid4())}
         try:
-            resp = requests.post(self._remote_url(), json=payload, timeout=self.timeout, stream=True, headers=hdrs)
+            resp = _get_session().post(self._remote_url(), data=_tool_call_payload(name, params, _next_id()), timeout=self.timeout, stream=True, headers=self._sse_headers)
         except requests.RequestException:
             return None
         if resp.status_code != 200:
             return None
         def _iter():
-            for line in resp.iter_lines(decode_unicode=True):
-                yield line or ""
+            # 按 64KB 字节块拉流后自行切行：
+            # iter_lines(decode_unicode=True) 会对每个 chunk 走编码探测并
+            # 逐块转 str，这里只在产出时按 UTF-8 解码一次
+            buf = bytearray()
+            try:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    if not chunk:
+                        continue
+                    buf += chunk
+                    while True:
+                        nl = buf.find(b"\n")
+                        if nl < 0:
+                            break
+                        line = bytes(buf[:nl]).rstrip(b"\r")
+                        del buf[:nl + 1]
+                        yield line.decode("utf-8", errors="replace")
+                if buf:
+                    yield bytes(buf).decode("utf-8", errors="replace")
+            finally:
+                resp.close()
         return _iter()
 
 class MCPStdioClient:
@@ -249,16 +426,22 @@ class MCPStdioClient:
         - `timeout`: 请求与读取超时时间（秒）
         """
         self.timeout = timeout
-        self._server_name = server_name or os.getenv("MCP_SERVER_NAME")
+        self._server_name = server_name or _DEFAULT_SERVER_NAME
         cfg_path = config_path or str(Path(__file__).resolve().parent / "config" / "mcp_server_config.json")
         chosen = self._server_name
         entry = self._select_entry(cfg_path, chosen)
         if not entry:
             raise MCPClientError("No stdio server entry found")
         self._proc = None
-        self._out_q = queue.Queue()
+        # 子进程 stderr 环形缓冲：仅保留最近的日志行供诊断
+        self._stderr_ring: deque = deque(maxlen=1000)
+        # 目录结果缓存: key -> (时间戳, 结果)
+        self._catalog_cache: Dict[str, tuple] = {}
+        # 按请求 id 路由响应：rid -> [Event, 响应]；并发请求互不干扰
+        self._pending: Dict[Any, list] = {}
+        self._pending_lock = threading.Lock()
         self._start(entry)
-        init_id = str(uuid.uuid4())
+        init_id = _next_id()
         payload = {
             "jsonrpc": "2.0",
             "id": init_id,
@@ -280,14 +463,9 @@ class MCPStdioClient:
         仅支持 `mcpServers{}` 键值结构。
         """
         try:
-            p = Path(cfg_path)
-            if not p.exists():
+            data = _load_config(cfg_path)
+            if data is None:
                 return None
-            try:
-                text = p.read_text(encoding="utf-8-sig")
-            except Exception:
-                text = p.read_text(encoding="utf-8")
-            data = json.loads(text)
             m = data.get("mcpServers") or {}
             if m:
                 if chosen and chosen in m:
@@ -317,12 +495,14 @@ class MCPStdioClient:
         for k, v in add_env.items():
             env[str(k)] = str(v)
         cwd = entry.get("cwd") or None
-        exe = shutil.which(cmd) or cmd
+        exe = _which(cmd, env.get("PATH")) or cmd
         if cwd:
             p = Path(cwd)
             if not p.exists() or not p.is_dir():
                 raise MCPClientError(f"Invalid working directory: {cwd}")
         try:
+            # 二进制管道：省去 TextIOWrapper 的逐行解码，
+            # 字节行直接交给解析器（orjson 原生接受 UTF-8 字节）
             proc = subprocess.Popen(
                 [exe] + list(args),
                 stdin=subprocess.PIPE,
@@ -330,10 +510,6 @@ class MCPStdioClient:
                 stderr=subprocess.PIPE,
                 cwd=cwd,
                 env=env,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                bufsize=1,
             )
         except FileNotFoundError:
             path_env = env.get("PATH") or ""
@@ -341,20 +517,78 @@ class MCPStdioClient:
         self._proc = proc
         t = threading.Thread(target=self._reader, daemon=True)
         t.start()
+        # 必须持续排空 stderr：服务器日志超过内核管道缓冲（约 64KB）
+        # 会让子进程阻塞在写端，连带卡死 stdout 上的所有请求
+        t_err = threading.Thread(target=self._stderr_reader, daemon=True)
+        t_err.start()
 
     def _reader(self) -> None:
         """
-        后台线程：逐行读取子进程标准输出并放入队列。
-        - 去除行尾换行符；忽略空行
+        后台线程：成块读取子进程标准输出，按换行切分后逐条派发。
+        - `os.read` 一次拉取整个内核缓冲，消息密集时多行只需一次系统调用，
+          避免逐行迭代带来的每行唤醒与 GIL 争抢
+        - 无人等待的消息（通知等）直接丢弃
         """
         if not self._proc or not self._proc.stdout:
             return
-        for line in self._proc.stdout:
-            if not line:
-                continue
-            s = line.rstrip("\r\n")
-            if s:
-                self._out_q.put(s)
+        fd = self._proc.stdout.fileno()
+        buf = bytearray()
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                break
+            if not chunk:
+                break
+            buf += chunk
+            while True:
+                nl = buf.find(b"\n")
+                if nl < 0:
+                    break
+                line = bytes(buf[:nl])
+                del buf[:nl + 1]
+                self._dispatch_line(line)
+        # 进程退出：唤醒所有等待者，避免卡到超时
+        with self._pending_lock:
+            waiters = list(self._pending.values())
+        for waiter in waiters:
+            waiter[0].set()
+
+    def _dispatch_line(self, line: bytes) -> None:
+        """解析一行响应并按 `id` 唤醒对应等待者。"""
+        s = line.strip()
+        if not s:
+            return
+        try:
+            msg = jsonutil.loads(s)
+        except Exception:
+            return
+        if not isinstance(msg, dict):
+            return
+        rid = msg.get("id")
+        with self._pending_lock:
+            waiter = self._pending.get(rid)
+        if waiter is not None:
+            waiter[1] = msg
+            waiter[0].set()
+
+    def _stderr_reader(self) -> None:
+        """
+        后台线程：持续排空子进程标准错误，写入环形缓冲。
+        - 不排空时日志填满管道会造成子进程阻塞（死锁）
+        """
+        if not self._proc or not self._proc.stderr:
+            return
+        try:
+            for line in self._proc.stderr:
+                self._stderr_ring.append(line)
+        except Exception:
+            pass
+
+    def stderr_tail(self, n: int = 20) -> str:
+        """返回子进程最近 `n` 行标准错误文本，供故障诊断。"""
+        lines = list(self._stderr_ring)[-n:]
+        return b"".join(lines).decode("utf-8", errors="replace")
 
     def _send(self, obj: Dict[str, Any]) -> None:
         """
@@ -363,72 +597,76 @@ class MCPStdioClient:
         """
         if not self._proc or not self._proc.stdin:
             raise MCPClientError("Process not started")
-        data = json.dumps(obj, separators=(",", ":"))
-        self._proc.stdin.write(data + "\n")
+        self._proc.stdin.write(jsonutil.dumps_bytes(obj) + b"\n")
         self._proc.stdin.flush()
 
     def _request(self, obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         发送请求并阻塞等待对应 `id` 的响应。
-        - 利用队列接收后台线程推送的标准输出
-        - 超时或解析失败返回 `None`
+        - 响应由读取线程按 id 精确派发，并发请求不会互相吞消息
+        - 超时或进程退出返回 `None`
         """
         rid = obj.get("id")
-        self._send(obj)
-        end = None
-        if self.timeout:
-            end = (self.timeout)
-        while True:
-            try:
-                s = self._out_q.get(timeout=self.timeout)
-            except Exception:
+        waiter = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[rid] = waiter
+        try:
+            self._send(obj)
+            if not waiter[0].wait(timeout=self.timeout):
                 return None
-            try:
-                msg = json.loads(s)
-            except Exception:
-                continue
-            if isinstance(msg, dict) and msg.get("id") == rid:
-                return msg
+            return waiter[1]
+        finally:
+            with self._pending_lock:
+                self._pending.pop(rid, None)
 
     def list_tools(self) -> Dict[str, Any]:
         """
         拉取子进程 MCP 服务器的工具目录。
         返回: `{"tools": [...], "remote_enabled": True}`
         """
-        rid = str(uuid.uuid4())
+        cached = _catalog_get(self._catalog_cache, "tools")
+        if cached is not None:
+            return cached
+        rid = _next_id()
         payload = {"jsonrpc": "2.0", "method": "tools/list", "params": {}, "id": rid}
         resp = self._request(payload) or {}
         res = resp.get("result") or {}
-        return {"tools": res.get("tools") or [], "remote_enabled": True}
+        return _catalog_put(self._catalog_cache, "tools", {"tools": res.get("tools") or [], "remote_enabled": True})
 
     def list_prompts(self) -> Dict[str, Any]:
         """
         拉取子进程 MCP 服务器的提示词目录。
         返回: `{"prompts": [...], "remote_enabled": True}`
         """
-        rid = str(uuid.uuid4())
+        cached = _catalog_get(self._catalog_cache, "prompts")
+        if cached is not None:
+            return cached
+        rid = _next_id()
         payload = {"jsonrpc": "2.0", "method": "prompts/list", "params": {}, "id": rid}
         resp = self._request(payload) or {}
         res = resp.get("result") or {}
-        return {"prompts": res.get("prompts") or [], "remote_enabled": True}
+        return _catalog_put(self._catalog_cache, "prompts", {"prompts": res.get("prompts") or [], "remote_enabled": True})
 
     def list_resources(self) -> Dict[str, Any]:
         """
         拉取子进程 MCP 服务器的资源目录。
         返回: `{"resources": [...], "remote_enabled": True}`
         """
-        rid = str(uuid.uuid4())
+        cached = _catalog_get(self._catalog_cache, "resources")
+        if cached is not None:
+            return cached
+        rid = _next_id()
         payload = {"jsonrpc": "2.0", "method": "resources/list", "params": {}, "id": rid}
         resp = self._request(payload) or {}
         res = resp.get("result") or {}
-        return {"resources": res.get("resources") or [], "remote_enabled": True}
+        return _catalog_put(self._catalog_cache, "resources", {"resources": res.get("resources") or [], "remote_enabled": True})
 
     def call_tool(self, name: str, **params) -> Optional[Dict[str, Any]]:
         """
         通过 stdio 执行指定工具。
         返回: `result.data` 或原始结果；失败返回 `None`。
         """
-        rid = str(uuid.uuid4())
+        rid = _next_id()
         payload = {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": name, "arguments": params}, "id": rid}
         resp = self._request(payload)
         if not resp:
@@ -460,7 +698,7 @@ if __name__ == "__main__":
     except MCPClientError as e:
         print(f"初始化失败: {e}")
         raise SystemExit(1)
-    print(json.dumps(client.list_tools(), ensure_ascii=False, indent=2))
+    print(jsonutil.dumps(client.fetch_catalog(), indent=True))
 
 
 __all__ = ["MCPClient", "MCPClientError", "MCPStdioClient"]
@@ -1,16 +1,71 @@
 import os
-import json
 import logging
 import time
-import re
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, as_completed
 from pathlib import Path
 from typing import Dict, Optional, Any, List, Tuple
 
 from mcp_client import MCPClient, MCPClientError, MCPStdioClient
 import constants
+import jsonutil
 
 LOGGER = logging.getLogger(__name__)
 
+# <tool> 契约的字面定界符；模块级常量避免每次扫描重建字符串
+_TOOL_OPEN = "<tool>"
+_TOOL_CLOSE = "</tool>"
+_TOOL_OPEN_LEN = len(_TOOL_OPEN)
+_TOOL_CLOSE_LEN = len(_TOOL_CLOSE)
+
+# 已解析 JSON 文件缓存: path -> (mtime_ns, size, data)
+# 配置/状态/顺序文件每个请求都会被读取，按 mtime+size 命中可免去重复 read+parse
+_JSON_CACHE: Dict[str, Tuple[int, int, Any]] = {}
+_JSON_CACHE_LOCK = threading.Lock()
+
+# 最近一次写入的序列化字节: path -> bytes；内容未变的保存直接跳过磁盘写
+_JSON_WRITE_CACHE: Dict[str, bytes] = {}
+
+# 后台监视线程：以 1Hz 轮询已读过的 JSON 文件并维护"缓存仍然新鲜"标记。
+# 标记为真时 _load_json 连 stat 都不用发，热路径上的读取退化为一次字典查找；
+# 文件变更最迟在一个轮询周期后被发现，下次读取照常走 stat+重新解析
+_WATCH_INTERVAL = 1.0
+_WATCH_FRESH: Dict[str, bool] = {}
+_WATCHER_STARTED = False
+
+
+def _watch_loop() -> None:
+    while True:
+        time.sleep(_WATCH_INTERVAL)
+        for key in list(_WATCH_FRESH.keys()):
+            try:
+                st = os.stat(key)
+                sig = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                sig = None
+            with _JSON_CACHE_LOCK:
+                ent = _JSON_CACHE.get(key)
+                _WATCH_FRESH[key] = ent is not None and sig is not None and (ent[0], ent[1]) == sig
+
+
+def _watch_path(key: str) -> None:
+    global _WATCHER_STARTED
+    with _JSON_CACHE_LOCK:
+        _WATCH_FRESH.setdefault(key, False)
+        if not _WATCHER_STARTED:
+            threading.Thread(target=_watch_loop, daemon=True).start()
+            _WATCHER_STARTED = True
+
+# 固定形状错误信封的模板；只有 spec 是变量，静态部分不再逐次重新序列化
+_ERR_NO_NAME = '{\n  "error": "缺少工具名",\n  "spec": %s\n}'
+_ERR_NOT_FOUND = '{\n  "error": "未找到匹配的工具",\n  "spec": %s\n}'
+
+# 聚合注册表缓存的有效期（秒）；与客户端目录缓存的量级保持一致，
+# 在配置/状态文件未变的前提下限制对服务器端目录变化的最大滞后
+_REGISTRY_TTL = 30.0
+
 class MCPHost:
     """
     模块: mcp_host
@@ -30,30 +85,80 @@ class MCPHost:
         self._cfg: Dict[str, Any] = {}
         self._servers: Dict[str, Dict[str, Any]] = {}
         self._clients: Dict[str, MCPClient] = {}
+        self._clients_lock = threading.Lock()
+        self._name_locks: Dict[str, threading.Lock] = {}
+        self._last_used: Dict[str, float] = {}
+        self._guide_cache: Optional[Tuple[Any, str]] = None
+        # 指南的单工具渲染片段缓存: 工具名 -> (schema 对象, 备注, 行列表)
+        self._guide_frag_cache: Dict[str, Tuple[Any, str, List[str]]] = {}
+        # list_all_tools 的聚合结果缓存: (键, 时间戳, 注册表)
+        self._registry_cache: Optional[Tuple[Any, float, Dict[str, Dict[str, Any]]]] = None
+        # 工具名 -> 服务器名 的轻量索引，供无 server 字段的调度直查
+        self._tool_to_server: Dict[str, str] = {}
+        # 参数 schema 提取缓存: id(schema) -> (schema 对象, 结果)；
+        # 存对象本身防止 id 复用导致误命中
+        self._param_schema_cache: Dict[int, Tuple[Any, Dict[str, Any]]] = {}
         self.load_config(self.config_path)
         if prewarm:
             self.start(prewarm=True)
 
     @staticmethod
     def _load_json(path: str) -> Any:
-        p = Path(path)
-        if not p.exists():
+        key = str(path)
+        # 监视线程确认缓存新鲜时免去本次 stat
+        if _WATCH_FRESH.get(key):
+            with _JSON_CACHE_LOCK:
+                ent = _JSON_CACHE.get(key)
+                if ent is not None:
+                    return ent[2]
+        # 先查 mtime+size 缓存，未变化的文件直接复用上次的解析结果
+        try:
+            st = os.stat(path)
+        except OSError:
             return None
+        with _JSON_CACHE_LOCK:
+            ent = _JSON_CACHE.get(key)
+            if ent is not None and ent[0] == st.st_mtime_ns and ent[1] == st.st_size:
+                return ent[2]
+        p = Path(path)
         try:
-            try:
-                text = p.read_text(encoding="utf-8-sig")
-            except Exception:
-                text = p.read_text(encoding="utf-8")
-            return json.loads(text)
+            raw = p.read_bytes()
+            # 手动剥离 BOM 后直接把字节交给解析器，
+            # 免去 utf-8-sig 的额外编解码器查找与 str 中转
+            if raw[:3] == b"\xef\xbb\xbf":
+                raw = raw[3:]
+            data = jsonutil.loads(raw)
         except Exception:
             return None
+        with _JSON_CACHE_LOCK:
+            _JSON_CACHE[key] = (st.st_mtime_ns, st.st_size, data)
+        _watch_path(key)
+        return data
 
     @staticmethod
     def _save_json(path: str, data: Any) -> bool:
         try:
+            key = str(path)
+            payload = jsonutil.dumps_bytes(data, indent=True)
+            # 内容与上次写入完全一致时不落盘（UI 的幂等保存很常见）
+            with _JSON_CACHE_LOCK:
+                unchanged = _JSON_WRITE_CACHE.get(key) == payload
+            if unchanged and os.path.exists(path):
+                return True
             p = Path(path)
             p.parent.mkdir(parents=True, exist_ok=True)
-            p.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            # 先写临时文件再原子替换，并发读取不会看到半截文件
+            tmp = p.with_suffix(p.suffix + ".tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, p)
+            # 写入后同步缓存，后续读取无需回到磁盘
+            try:
+                st = os.stat(path)
+                with _JSON_CACHE_LOCK:
+                    _JSON_CACHE[key] = (st.st_mtime_ns, st.st_size, data)
+                    _JSON_WRITE_CACHE[key] = payload
+            except OSError:
+                pass
             return True
         except Exception:
             return False
@@ -79,10 +184,80 @@ class MCPHost:
                 "enabled": entry.get("enabled", True),
                 "type": entry.get("type"),
                 "note": entry.get("note"),
+                "prewarm": entry.get("prewarm", True),
                 "status": "unknown",
             }
         self._servers = servers_map
 
+    def _make_client(self, name: str, meta: Dict[str, Any]) -> MCPClient:
+        # 按条目类型实例化客户端；异常由调用方统一捕获并标记状态
+        typ = str(meta.get("type")) if meta.get("type") is not None else "http"
+        if typ == "stdio":
+            return MCPStdioClient(server_name=name, config_path=self.config_path)
+        return MCPClient(server_name=name, config_path=self.config_path)
+
+    def _ensure_client(self, name: str) -> Optional[MCPClient]:
+        """
+        线程安全地获取（或懒创建）指定服务器的客户端。
+        - 每个服务器名一把创建锁，不同服务器可并行建连（stdio 启动较慢）
+        - 创建失败时标记 `down` 并返回 `None`
+        """
+        client = self._clients.get(name)
+        if client:
+            self._last_used[name] = time.monotonic()
+            return client
+        meta = self._servers.get(name)
+        if not meta:
+            return None
+        with self._clients_lock:
+            lock = self._name_locks.setdefault(name, threading.Lock())
+        with lock:
+            client = self._clients.get(name)
+            if client:
+                self._last_used[name] = time.monotonic()
+                return client
+            try:
+                client = self._make_client(name, meta)
+            except MCPClientError:
+                self._servers[name]["status"] = "down"
+                return None
+            with self._clients_lock:
+                self._clients[name] = client
+                self._last_used[name] = time.monotonic()
+            self._servers[name]["status"] = "running"
+            return client
+
+    def _drop_client(self, name: str) -> None:
+        """移除并尽量关闭指定服务器的客户端实例。"""
+        with self._clients_lock:
+            client = self._clients.pop(name, None)
+            self._last_used.pop(name, None)
+        if client is not None:
+            try:
+                close = getattr(client, "close", None)
+                if close:
+                    close()
+            except Exception:
+                pass
+
+    def evict_idle_clients(self, max_idle: float = 300.0) -> int:
+        """
+        回收闲置超过 `max_idle` 秒的客户端（尤其是 stdio 子进程）。
+        下次调用会按需重建。返回回收数量。
+        """
+        now = time.monotonic()
+        stale: List[str] = []
+        with self._clients_lock:
+            for name in list(self._clients.keys()):
+                ts = self._last_used.get(name)
+                if ts is not None and now - ts > max_idle:
+                    stale.append(name)
+        for name in stale:
+            self._drop_client(name)
+            if name in self._servers:
+                self._servers[name]["status"] = "idle"
+        return len(stale)
+
     def start(self, prewarm: bool = True) -> None:
         """
         启动所有启用状态的服务器客户端。
@@ -90,36 +265,63 @@ class MCPHost:
         - 预热: 对 stdio 类型执行一次 `tools/list` 以加速后续调用
         - 失败时将服务器标记为 `down`
         """
-        # 遍历启用的服务器，为其创建对应类型的客户端并可选预热
+        # 预热路径走线程池：慢的 stdio 启动不再逐个串行排队
+        if prewarm:
+            self.prewarm_threaded()
+            return
         for name, meta in self._servers.items():
             if not meta.get("enabled"):
                 continue
-            if name in self._clients and self._clients[name]:
-                continue
-            try:
-                typ = str(meta.get("type")) if meta.get("type") is not None else "http"
-                if typ == "stdio":
-                    client = MCPStdioClient(server_name=name, config_path=self.config_path)
-                else:
-                    client = MCPClient(server_name=name, config_path=self.config_path)
-                self._clients[name] = client
-                self._servers[name]["status"] = "running"
-                if prewarm:
-                    try:
-                        if typ == "stdio":
-                            # 通过工具列表调用提前“唤醒”子进程服务，减少首次调用开销
-                            LOGGER.info("[Prewarm] stdio server '%s' listing tools...", name)
-                            t0 = time.perf_counter()
-                            res = client.list_tools()
-                            dt = int((time.perf_counter() - t0) * 1000)
-                            cnt = len((res or {}).get("tools") or [])
-                            LOGGER.info("[Prewarm] stdio server '%s' ready in %dms, tools=%d", name, dt, cnt)
-                        else:
-                            LOGGER.info("[Prewarm] skip http server '%s'", name)
-                    except Exception:
-                        LOGGER.warning("[Prewarm] server '%s' prewarm failed", name)
-            except MCPClientError:
-                self._servers[name]["status"] = "down"
+            self._ensure_client(name)
+
+    def _prewarm_one(self, name: str) -> None:
+        """建立单个服务器的客户端并预热（stdio 做一次 tools/list）。"""
+        client = self._ensure_client(name)
+        if client is None:
+            return
+        meta = self._servers.get(name) or {}
+        typ = str(meta.get("type")) if meta.get("type") is not None else "http"
+        try:
+            if typ == "stdio":
+                # 通过工具列表调用提前“唤醒”子进程服务，减少首次调用开销
+                LOGGER.info("[Prewarm] stdio server '%s' listing tools...", name)
+                t0 = time.perf_counter()
+                res = client.list_tools()
+                dt = int((time.perf_counter() - t0) * 1000)
+                cnt = len((res or {}).get("tools") or [])
+                LOGGER.info("[Prewarm] stdio server '%s' ready in %dms, tools=%d", name, dt, cnt)
+            else:
+                LOGGER.info("[Prewarm] skip http server '%s'", name)
+        except Exception:
+            LOGGER.warning("[Prewarm] server '%s' prewarm failed", name)
+
+    def prewarm_threaded(self, max_workers: Optional[int] = None) -> None:
+        """
+        并行预热全部启用的服务器。
+        - 每台服务器一个工作线程（上限 32），慢的 stdio 启动不再拖累其它服务器
+        - 与按需请求天然收敛：`_ensure_client` 的按名创建锁保证同名只建一次
+        """
+        # 条目可用 `"prewarm": false` 选择退出启动预热（子进程留到首次调用再拉起）
+        names = [n for n, m in self._servers.items() if m.get("enabled") and m.get("prewarm", True)]
+        if not names:
+            return
+        workers = max_workers or min(32, len(names))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for name in names:
+                ex.submit(self._prewarm_one, name)
+
+    async def prewarm_async(self) -> None:
+        """
+        异步预热：客户端创建放入线程，再并发拉取各启用服务器的工具列表。
+        - 供异步入口在用户输入等待期间后台执行，隐藏启动开销
+        """
+        await asyncio.to_thread(self.start, False)
+        names = [s["name"] for s in self.list_servers()]
+        if names:
+            await asyncio.gather(
+                *(asyncio.to_thread(self.list_tools, n) for n in names),
+                return_exceptions=True,
+            )
 
     def enable_server(self, name: str) -> bool:
         """
@@ -131,18 +333,9 @@ class MCPHost:
         if not meta:
             return False
         self._servers[name]["enabled"] = True
-        if name not in self._clients or not self._clients[name]:
-            try:
-                typ = str(meta.get("type")) if meta.get("type") is not None else "http"
-                if typ == "stdio":
-                    self._clients[name] = MCPStdioClient(server_name=name, config_path=self.config_path)
-                else:
-                    self._clients[name] = MCPClient(server_name=name, config_path=self.config_path)
-                self._servers[name]["status"] = "running"
-            except MCPClientError:
-                self._servers[name]["status"] = "down"
-                return False
-        return True
+        self._registry_cache = None
+        self._tool_to_server = {}
+        return self._ensure_client(name) is not None
 
     def disable_server(self, name: str) -> bool:
         """
@@ -155,11 +348,9 @@ class MCPHost:
         if not meta:
             return False
         self._servers[name]["enabled"] = False
-        if name in self._clients:
-            try:
-                del self._clients[name]
-            except Exception:
-                pass
+        self._registry_cache = None
+        self._tool_to_server = {}
+        self._drop_client(name)
         self._servers[name]["status"] = "disabled"
         return True
 
@@ -171,7 +362,7 @@ class MCPHost:
         # 仅返回启用中的服务器（过滤掉 disabled 项）
         out = []
         for name, meta in self._servers.items():
-            if not bool(meta.get("enabled")):
+            if not meta.get("enabled"):
                 continue
             out.append({
                 "name": name,
@@ -187,14 +378,12 @@ class MCPHost:
         返回: `{"tools": [...], "remote_enabled": bool}`；失败时空列表与 `remote_enabled=False`。
         """
         # 确保服务器启用且客户端可用后，调用工具列表接口
-        if not self._servers.get(name) or not self._servers[name].get("enabled"):
+        meta = self._servers.get(name)
+        if not meta or not meta.get("enabled"):
             return {"tools": [], "remote_enabled": False}
-        client = self._clients.get(name)
+        client = self._ensure_client(name)
         if not client:
-            ok = self.enable_server(name)
-            if not ok:
-                return {"tools": [], "remote_enabled": False}
-            client = self._clients.get(name)
+            return {"tools": [], "remote_enabled": False}
         try:
             return client.list_tools()
         except Exception:
@@ -210,21 +399,38 @@ class MCPHost:
             return {}
         return d if isinstance(d, dict) else {}
 
+    def _registry_key(self) -> Tuple[Any, Any, Tuple[str, ...]]:
+        """聚合注册表的缓存键：配置与状态文件的 stat 指纹 + 启用服务器集合。"""
+        def stat_key(p):
+            try:
+                st = os.stat(p)
+                return (st.st_mtime_ns, st.st_size)
+            except OSError:
+                return None
+        enabled = tuple(n for n, m in self._servers.items() if m.get("enabled"))
+        return (stat_key(self.config_path), stat_key(constants.TOOL_STATES_PATH), enabled)
+
     def list_all_tools(self) -> Dict[str, Dict[str, Any]]:
         # 聚合所有启用服务器的工具，并结合状态文件过滤掉关闭的工具
+        # 无 server 字段的 call_tool 每次都要走这里；配置/状态未变时直接复用上次聚合
+        key = self._registry_key()
+        cached = self._registry_cache
+        if cached is not None and cached[0] == key and time.monotonic() - cached[1] <= _REGISTRY_TTL:
+            return cached[2]
         reg: Dict[str, Dict[str, Any]] = {}
         states = self.load_states()
+        states_get = states.get
+        list_tools = self.list_tools
+        # list_servers 已过滤禁用项，无需再验 name/enabled
         for s in self.list_servers():
-            name = s.get("name")
-            if not name or not s.get("enabled"):
-                continue
-            
+            name = s["name"]
+
             # Check if server is disabled in tool_states.json
-            sstate = states.get(name) or {}
+            sstate = states_get(name) or {}
             if sstate.get("enabled") is False:
                 continue
 
-            info = self.list_tools(name) or {"tools": []}
+            info = list_tools(name) or {"tools": []}
             tools = info.get("tools") or []
             tstate = (sstate.get("tools") if isinstance(sstate.get("tools"), dict) else {}) or {}
             for t in tools:
@@ -239,18 +445,61 @@ class MCPHost:
                             continue
                     except Exception:
                         pass
-                reg[n] = {"server": name, "schema": t}
+                if n in reg and reg[n]["server"] != name:
+                    # 跨服务器重名：后到者挂到 `server__tool` 命名空间键下，
+                    # 不再静默覆盖先注册的工具
+                    reg[f"{name}__{n}"] = {"server": name, "schema": t}
+                else:
+                    reg[n] = {"server": name, "schema": t}
+        self._registry_cache = (key, time.monotonic(), reg)
+        self._tool_to_server = {n: v["server"] for n, v in reg.items()}
         return reg
 
     def extract_param_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        # 注册表缓存让同一 schema 对象跨轮次复用，按对象身份记忆提取结果
+        key = id(schema)
+        ent = self._param_schema_cache.get(key)
+        if ent is not None and ent[0] is schema:
+            return ent[1]
         cand = schema.get("inputSchema") if isinstance(schema, dict) else None
-        return cand if isinstance(cand, dict) else {}
+        result = cand if isinstance(cand, dict) else {}
+        if len(self._param_schema_cache) > 1024:
+            self._param_schema_cache.clear()
+        self._param_schema_cache[key] = (schema, result)
+        return result
 
-    def tools_guide(self, registry: Dict[str, Dict[str, Any]]) -> str:
+    def tools_guide(self, registry: Dict[str, Dict[str, Any]], states: Optional[Dict[str, Any]] = None) -> str:
         # 基于工具的描述、JSON Schema 与状态备注，生成可读的参数指南
+        # 指南内容只取决于注册表与状态文件，按内容指纹缓存，避免每轮重复格式化
+        # `states` 可由调用方传入，与 list_all_tools 共用同一次读取
+        if states is None:
+            states = self.load_states()
+        key = None
+        try:
+            key = (
+                jsonutil.dumps(registry, sort_keys=True),
+                jsonutil.dumps(states, sort_keys=True),
+            )
+        except Exception:
+            key = None
+        if key is not None and self._guide_cache is not None and self._guide_cache[0] == key:
+            return self._guide_cache[1]
+        # 进程内未命中时再查磁盘缓存（跨进程/重启复用渲染结果）
+        fp = None
+        if key is not None:
+            try:
+                fp = hashlib.blake2b((key[0] + "\n" + key[1]).encode("utf-8"), digest_size=16).hexdigest()
+                cache_file = constants.CONFIG_DIR / f"tools_guide.{fp}.txt"
+                if cache_file.exists():
+                    text = cache_file.read_text(encoding="utf-8")
+                    self._guide_cache = (key, text)
+                    return text
+            except Exception:
+                fp = None
         lines: List[str] = []
-        states = self.load_states()
-        
+        # CPython 习惯法：把方法绑定提到循环外，省去每行一次的属性查找
+        extend = lines.extend
+
         # Sort by server order in tool_states.json, then by tool name
         server_order = list(states.keys())
         
@@ -267,12 +516,6 @@ class MCPHost:
         for tool_name in sorted_keys:
             schema = registry[tool_name]["schema"]
             server = registry[tool_name]["server"]
-            desc = (schema.get("description") or schema.get("summary") or schema.get("note") or "") if isinstance(schema, dict) else ""
-            
-            lines.append(f"[Tool] {tool_name}")
-            if desc:
-                lines.append(f"  Description: {desc}")
-            
             try:
                 note = ""
                 sstate = states.get(server) or {}
@@ -280,18 +523,32 @@ class MCPHost:
                 entry = tstate.get(tool_name) or {}
                 if isinstance(entry.get("note"), str):
                     note = (entry.get("note") or "").strip()
-                if note:
-                    # 若工具在状态文件中带有备注，则插入到指南中
-                    lines.append(f"  Note: {note}")
             except Exception:
-                pass
-                
+                note = ""
+
+            # 单工具的渲染结果只取决于 schema 对象与备注；
+            # 状态局部变更（如改一条备注）时其余工具的片段直接复用
+            ent = self._guide_frag_cache.get(tool_name)
+            if ent is not None and ent[0] is schema and ent[1] == note:
+                extend(ent[2])
+                continue
+
+            frag: List[str] = []
+            append = frag.append
+            desc = (schema.get("description") or schema.get("summary") or schema.get("note") or "") if isinstance(schema, dict) else ""
+            append(f"[Tool] {tool_name}")
+            if desc:
+                append(f"  Description: {desc}")
+            if note:
+                # 若工具在状态文件中带有备注，则插入到指南中
+                append(f"  Note: {note}")
+
             ps = self.extract_param_schema(schema)
             props = (ps.get("properties") if isinstance(ps, dict) else None) or {}
             required = (ps.get("required") if isinstance(ps, dict) else None) or []
             
             if props:
-                lines.append("  Parameters:")
+                append("  Parameters:")
                 for k, v in props.items():
                     typ = v.get("type") if isinstance(v, dict) else None
                     dsc = v.get("description") if isinstance(v, dict) else None
@@ -299,13 +556,13 @@ class MCPHost:
                     seg = f"    - {k} ({typ or 'any'}, {req})"
                     if dsc:
                         seg += f": {dsc}"
-                    lines.append(seg)
+                    append(seg)
             else:
                 alt = schema.get("parameters") if isinstance(schema, dict) else None
                 if alt is None:
                     alt = schema.get("args") if isinstance(schema, dict) else None
                 if isinstance(alt, list) and alt:
-                    lines.append("  Parameters:")
+                    append("  Parameters:")
                     for p in alt:
                         name = p.get("name") or "param"
                         typ = p.get("type") or "any"
@@ -314,50 +571,153 @@ class MCPHost:
                         seg = f"    - {name} ({typ}, {req})"
                         if dsc:
                             seg += f": {dsc}"
-                        lines.append(seg)
+                        append(seg)
                 else:
                     # 无法从 schema/parameters/args 推断参数细节
-                    lines.append("  Parameters: (No detailed information available)")
-            lines.append("-" * 50)
-        return "\n".join(lines)
+                    append("  Parameters: (No detailed information available)")
+            append("-" * 50)
+            self._guide_frag_cache[tool_name] = (schema, note, frag)
+            extend(frag)
+        text = "\n".join(lines)
+        if key is not None:
+            self._guide_cache = (key, text)
+        if fp is not None:
+            # 写入磁盘缓存并清理旧指纹文件；失败不影响正常返回
+            try:
+                for stale in constants.CONFIG_DIR.glob("tools_guide.*.txt"):
+                    if stale.name != f"tools_guide.{fp}.txt":
+                        stale.unlink()
+                (constants.CONFIG_DIR / f"tools_guide.{fp}.txt").write_text(text, encoding="utf-8")
+            except Exception:
+                pass
+        return text
+
+    @staticmethod
+    def _iter_tool_payloads(text: str):
+        """
+        按字面定界符扫描 `<tool>…</tool>` 片段并产出内部 JSON 文本。
+        - `str.find` 走 CPython 的 fastsearch（memchr 级别），比回溯式正则快数倍
+        """
+        start = 0
+        while True:
+            i = text.find(_TOOL_OPEN, start)
+            if i < 0:
+                return
+            j = text.find(_TOOL_CLOSE, i + _TOOL_OPEN_LEN)
+            if j < 0:
+                return
+            yield text[i + _TOOL_OPEN_LEN:j].strip()
+            start = j + _TOOL_CLOSE_LEN
 
     def detect_tool(self, text: str) -> Tuple[bool, Dict[str, Any]]:
         if not isinstance(text, str):
             return False, {}
-        m = re.search(r"<tool>\s*(\{[\s\S]*?\})\s*</tool>", text, re.IGNORECASE)
-        if not m:
-            return False, {}
-        try:
-            spec = json.loads(m.group(1))
-        except Exception:
-            spec = {}
-        return bool(spec), spec
+        for payload in self._iter_tool_payloads(text):
+            try:
+                spec = jsonutil.loads(payload)
+            except Exception:
+                spec = {}
+            return bool(spec), spec if isinstance(spec, dict) else {}
+        return False, {}
+
+    def detect_tools(self, text: str) -> List[Dict[str, Any]]:
+        """
+        扫描文本中的全部 `<tool>…</tool>` 契约并按出现顺序返回列表。
+        - 单个片段解析失败时跳过，不影响其余契约
+        """
+        if not isinstance(text, str):
+            return []
+        specs: List[Dict[str, Any]] = []
+        for payload in self._iter_tool_payloads(text):
+            try:
+                spec = jsonutil.loads(payload)
+            except Exception:
+                continue
+            if spec and isinstance(spec, dict):
+                specs.append(spec)
+        return specs
 
-    def call_tool(self, spec: Dict[str, Any], formated: bool = True) -> str:
+    def call_tool(self, spec: Dict[str, Any], formated: bool = True, registry: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
         # 接受 `<tool>` JSON 契约，按注册表定位服务器并执行调用
+        # `registry` 可传入预先聚合好的注册表，批量调用共享一次构建
         name = (spec or {}).get("name")
         params = (spec or {}).get("parameters") or {}
         server = (spec or {}).get("server")
         if not name:
-            return json.dumps({"error": "缺少工具名", "spec": spec}, ensure_ascii=False, indent=2)
+            return _ERR_NO_NAME % jsonutil.dumps(spec)
         if not server:
-            registry = self.list_all_tools()
-            if name not in registry:
-                return json.dumps({"error": "未找到匹配的工具", "spec": spec}, ensure_ascii=False, indent=2)
-            server = registry[name]["server"]
+            # `server__tool` 形式的名称直接拆分路由，无需查注册表
+            if "__" in name:
+                cand, _, bare = name.partition("__")
+                if cand in self._servers:
+                    server, name = cand, bare
+        if not server:
+            if registry is not None:
+                server = (registry.get(name) or {}).get("server")
+            else:
+                # 先查轻量索引；未命中再触发一次注册表聚合后重查
+                server = self._tool_to_server.get(name)
+                if not server:
+                    server = (self.list_all_tools().get(name) or {}).get("server")
+            if not server:
+                return _ERR_NOT_FOUND % jsonutil.dumps(spec)
         try:
             res_str = self.call_server_tool(server, name, **params)
             try:
-                res_obj = json.loads(res_str)
+                res_obj = jsonutil.loads(res_str)
             except Exception:
                 res_obj = res_str
             payload = {"name": name, "server": server, "result": res_obj}
             if formated:
-                return json.dumps(payload, ensure_ascii=False, indent=2)
+                return jsonutil.dumps(payload, indent=True)
             else:
-                return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+                return jsonutil.dumps(payload)
         except Exception as e:
-            return json.dumps({"name": name, "server": server, "error": str(e)}, ensure_ascii=False, indent=2)
+            return jsonutil.dumps({"name": name, "server": server, "error": str(e)}, indent=True)
+
+    def call_tools(self, specs: List[Dict[str, Any]], max_concurrent: int = 8, formated: bool = True, stop_on_error: bool = False) -> List[str]:
+        """
+        并行执行一批相互独立的工具调用，按输入顺序返回结果。
+        - 整批共享一次注册表聚合；总耗时约等于最慢的一次调用
+        - `stop_on_error=True` 时首个失败会取消尚未开始的调用，
+          被取消的位置返回 `{"error": "cancelled", ...}`
+        """
+        specs = list(specs or [])
+        if not specs:
+            return []
+        registry = self.list_all_tools()
+        results: List[Optional[str]] = [None] * len(specs)
+        with ThreadPoolExecutor(max_workers=min(max_concurrent, len(specs))) as ex:
+            futures = {ex.submit(self.call_tool, spec, formated, registry): i for i, spec in enumerate(specs)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    res = fut.result()
+                except CancelledError:
+                    res = jsonutil.dumps({"error": "cancelled", "spec": specs[i]}, indent=True)
+                except Exception as e:
+                    res = jsonutil.dumps({"error": str(e), "spec": specs[i]}, indent=True)
+                results[i] = res
+                if stop_on_error:
+                    try:
+                        obj = jsonutil.loads(res)
+                        failed = isinstance(obj, dict) and "error" in obj
+                    except Exception:
+                        failed = False
+                    if failed:
+                        for f in futures:
+                            f.cancel()
+        for i, res in enumerate(results):
+            if res is None:
+                results[i] = jsonutil.dumps({"error": "cancelled", "spec": specs[i]}, indent=True)
+        return results
+
+    async def call_tool_async(self, spec: Dict[str, Any], formated: bool = True) -> str:
+        """
+        `call_tool` 的异步包装：在线程中执行阻塞的工具调用。
+        - 便于异步调用方（如 AsyncOpenAI 流程）让网络 I/O 与工具执行并行
+        """
+        return await asyncio.to_thread(self.call_tool, spec, formated)
 
     def call_server_tool(self, name: str, tool: str, **params) -> str:
         """
@@ -366,29 +726,29 @@ class MCPHost:
         返回: 工具返回的字典或 `None`
         """
         # 确保服务器启用并懒创建客户端，然后执行调用
-        if not self._servers.get(name) or not self._servers[name].get("enabled"):
+        meta = self._servers.get(name)
+        if not meta or not meta.get("enabled"):
             return "null"
-        client = self._clients.get(name)
+        client = self._ensure_client(name)
         if not client:
-            ok = self.enable_server(name)
-            if not ok:
-                return "null"
-            client = self._clients.get(name)
+            return "null"
         try:
             res = client.call_tool(tool, **params)
-            return json.dumps(res, ensure_ascii=False, separators=(",", ":")) if res is not None else "null"
+            return jsonutil.dumps(res) if res is not None else "null"
         except Exception:
             return "null"
 
-    def health_check(self, name: Optional[str] = None) -> Dict[str, Any]:
+    def health_check(self, name: Optional[str] = None, timeout: float = 2.0) -> Dict[str, Any]:
         """
         对指定或全部服务器执行健康检查。
         - 启用状态下调用客户端 `ping()` 判断运行/宕机
+        - 各服务器的 ping 并行执行，总耗时约等于最慢（或超时）的一台
         返回: `name -> { enabled, status }` 映射。
         """
         # 若客户端缺失会进行一次启用尝试；结果写回到服务器状态
         result = {}
         targets = [name] if name else list(self._servers.keys())
+        checks: List[str] = []
         for n in targets:
             meta = self._servers.get(n)
             if not meta:
@@ -397,49 +757,62 @@ class MCPHost:
             if not meta.get("enabled"):
                 result[n] = {"enabled": False, "status": "disabled"}
                 continue
-            client = self._clients.get(n)
+            checks.append(n)
+        if not checks:
+            return result
+
+        def _ping(n: str) -> str:
+            client = self._ensure_client(n)
             if not client:
-                ok = self.enable_server(n)
-                if not ok:
-                    result[n] = {"enabled": True, "status": "down"}
-                    continue
-                client = self._clients.get(n)
+                return "down"
             try:
-                ok = client.ping()
-                self._servers[n]["status"] = "running" if ok else "down"
-                result[n] = {"enabled": True, "status": self._servers[n]["status"]}
+                return "running" if client.ping() else "down"
             except Exception:
-                self._servers[n]["status"] = "down"
-                result[n] = {"enabled": True, "status": "down"}
+                return "down"
+
+        # 不用 with：卡死的 ping 不应拖住整个检查，超时即记为 down，
+        # 线程留给执行器自行回收
+        ex = ThreadPoolExecutor(max_workers=min(8, len(checks)))
+        try:
+            futs = [(n, ex.submit(_ping, n)) for n in checks]
+            deadline = time.monotonic() + timeout
+            for n, fut in futs:
+                try:
+                    status = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+                except Exception:
+                    status = "down"
+                self._servers[n]["status"] = status
+                result[n] = {"enabled": True, "status": status}
+        finally:
+            ex.shutdown(wait=False)
         return result
 
     def reload_config(self, path: Optional[str] = None) -> None:
         """
         重新加载配置并同步服务器/客户端状态。
-        - 移除已禁用或缺失的客户端，将其状态设为 `disabled`
-        - 对启用但无客户端的条目重新创建客户端
+        - 按新旧条目逐个比对：未变化的服务器保留其已建立的客户端
+        - 条目变化（url/headers/type 等）的客户端丢弃后按需重建
+        - 已禁用或缺失的客户端移除，状态设为 `disabled`
         """
-        # 重新读取配置，并使客户端缓存与启用状态保持一致
+        # 先留存旧条目，重载后只失效真正发生变化的客户端，
+        # 避免一次配置编辑把所有暖连接全部打断
+        old_entries = dict(self._cfg.get("mcpServers") or {})
         self.load_config(path or self.config_path)
-        for name, meta in list(self._clients.items()):
+        self._registry_cache = None
+        self._tool_to_server = {}
+        self._guide_frag_cache.clear()
+        self._param_schema_cache.clear()
+        new_entries = self._cfg.get("mcpServers") or {}
+        for name in list(self._clients.keys()):
             if not self._servers.get(name) or not self._servers[name].get("enabled"):
-                try:
-                    del self._clients[name]
-                except Exception:
-                    pass
+                self._drop_client(name)
                 if name in self._servers:
                     self._servers[name]["status"] = "disabled"
+            elif old_entries.get(name) != new_entries.get(name):
+                self._drop_client(name)
         for name in self._servers.keys():
             if self._servers[name].get("enabled") and name not in self._clients:
-                try:
-                    typ = str(self._servers[name].get("type")) if self._servers[name].get("type") is not None else "http"
-                    if typ == "stdio":
-                        self._clients[name] = MCPStdioClient(server_name=name, config_path=self.config_path)
-                    else:
-                        self._clients[name] = MCPClient(server_name=name, config_path=self.config_path)
-                    self._servers[name]["status"] = "running"
-                except MCPClientError:
-                    self._servers[name]["status"] = "down"
+                self._ensure_client(name)
 
     def get_client(self, name: str) -> Optional[MCPClient]:
         """
@@ -454,13 +827,12 @@ class MCPHost:
         拉取指定服务器的 Prompt 列表。
         - 自动处理客户端连接
         """
-        if not self._servers.get(name) or not self._servers[name].get("enabled"):
+        meta = self._servers.get(name)
+        if not meta or not meta.get("enabled"):
             return {"prompts": [], "remote_enabled": False}
-        client = self._clients.get(name)
+        client = self._ensure_client(name)
         if not client:
-            if not self.enable_server(name):
-                return {"prompts": [], "remote_enabled": False}
-            client = self._clients.get(name)
+            return {"prompts": [], "remote_enabled": False}
         try:
             return client.list_prompts()
         except Exception:
@@ -471,13 +843,12 @@ class MCPHost:
         拉取指定服务器的 Resource 列表。
         - 自动处理客户端连接
         """
-        if not self._servers.get(name) or not self._servers[name].get("enabled"):
+        meta = self._servers.get(name)
+        if not meta or not meta.get("enabled"):
             return {"resources": [], "remote_enabled": False}
-        client = self._clients.get(name)
+        client = self._ensure_client(name)
         if not client:
-            if not self.enable_server(name):
-                return {"resources": [], "remote_enabled": False}
-            client = self._clients.get(name)
+            return {"resources": [], "remote_enabled": False}
         try:
             return client.list_resources()
         except Exception:
@@ -487,6 +858,11 @@ class MCPHost:
         """返回当前的完整配置（原始字典）"""
         return self._cfg
 
+    def get_server_entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """按名称返回配置中的服务器条目；不存在时返回 None。"""
+        m = self._cfg.get("mcpServers") or {}
+        return m.get(name)
+
     def save_server_config(self, cfg: Dict[str, Any]) -> bool:
         """保存配置到文件，并触发重载"""
         ok = self._save_json(self.config_path, cfg)
@@ -510,8 +886,8 @@ class MCPHost:
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
     host = MCPHost(prewarm=False)
-    print(json.dumps({"servers": host.list_servers()}, ensure_ascii=False, indent=2))
+    print(jsonutil.dumps({"servers": host.list_servers()}, indent=True))
     for s in host.list_servers():
         if s.get("enabled"):
             tools = host.list_tools(s["name"])
-            print(json.dumps({"server": s["name"], "tools_count": len(tools.get("tools") or [])}, ensure_ascii=False, indent=2))
+            print(jsonutil.dumps({"server": s["name"], "tools_count": len(tools.get("tools") or [])}, indent=True))
@@ -559,8 +559,18 @@ async function openSettings(serverName) {
     content.appendChild(list)
   }
 
+  // prompts/resources 共享一次 /catalog 聚合请求，打开面板只付一个 RTT
+  let catalogPromise = null
+  const loadCatalog = () => {
+    if (!catalogPromise) {
+      catalogPromise = fetchJSON(`/api/server/${encodeURIComponent(serverName)}/catalog`)
+      catalogPromise.catch(()=>{ catalogPromise = null })
+    }
+    return catalogPromise
+  }
+
   const loadPrompts = async () => {
-    const res = await fetchJSON(`/api/server/${encodeURIComponent(serverName)}/prompts`)
+    const res = await loadCatalog()
     const arr = res.prompts || []
     setTabCount(2, arr.length)
     content.innerHTML = `<div class="muted">共 ${arr.length} 个提示</div>`
@@ -576,7 +586,7 @@ async function openSettings(serverName) {
   }
 
   const loadResources = async () => {
-    const res = await fetchJSON(`/api/server/${encodeURIComponent(serverName)}/resources`)
+    const res = await loadCatalog()
     const arr = res.resources || []
     setTabCount(3, arr.length)
     content.innerHTML = `<div class="muted">共 ${arr.length} 个资源</div>`